@@ -0,0 +1,86 @@
+"""
+Compression of published files, so the Content App can serve them with a ``Content-Encoding``.
+"""
+from gettext import gettext as _
+import gzip
+import mimetypes
+import os
+import shutil
+
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+CHUNK_SIZE = 1024 * 1024
+
+#: The content codings files can be compressed with, in the order they are preferred when serving.
+ENCODINGS = ('br', 'gzip')
+
+#: The suffix appended to the name of a file compressed with a content coding.
+SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+# Formats which are compressed already, besides the encodings known to mimetypes.
+COMPRESSED_EXTENSIONS = {'.7z', '.deb', '.jar', '.rpm', '.whl', '.zck', '.zip', '.zst'}
+
+
+def _gzip(src, dst):
+    with gzip.GzipFile(fileobj=dst, mode='wb', mtime=0) as compressed:
+        shutil.copyfileobj(src, compressed, CHUNK_SIZE)
+
+
+def _brotli(src, dst):
+    compressor = brotli.Compressor()
+    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+        dst.write(compressor.process(chunk))
+    dst.write(compressor.finish())
+
+
+_compressors = {
+    'br': _brotli,
+    'gzip': _gzip,
+}
+
+
+def get_compressor(encoding):
+    """
+    Get the function compressing a file with a content coding.
+
+    The function is called with the source and destination file objects.
+
+    Args:
+        encoding (str): A content coding of `ENCODINGS`.
+
+    Raises:
+        ImproperlyConfigured: When the encoding is not supported, or when 'br' is requested and
+            the optional brotli package is not installed.
+
+    Returns:
+        callable: The compressor.
+    """
+    if encoding not in _compressors:
+        raise ImproperlyConfigured(_("Unknown content coding '{encoding}'").format(
+            encoding=encoding
+        ))
+    if encoding == 'br' and brotli is None:
+        raise ImproperlyConfigured(_("The 'br' content coding requires the brotli package"))
+    return _compressors[encoding]
+
+
+def is_compressed(name):
+    """
+    Args:
+        name (str): A file name.
+
+    Returns:
+        bool: Whether the name is the one of a compressed file or archive.
+    """
+    if mimetypes.guess_type(name)[1]:
+        return True
+    return os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS
@@ -0,0 +1,82 @@
+# Generated by Django 2.2.28 on 2026-10-16 20:35
+
+from itertools import chain, islice
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+# The number of PublishedPath rows inserted per query, as by Publication.index_paths()
+BATCH_SIZE = 1000
+
+
+def index_complete_publications(apps, schema_editor):
+    """
+    Index the paths of the publications completed before PublishedPath existed.
+
+    This mirrors Publication.index_paths(), which is not available on historical models.
+    """
+    Publication = apps.get_model('core', 'Publication')
+    PublishedPath = apps.get_model('core', 'PublishedPath')
+    ContentArtifact = apps.get_model('core', 'ContentArtifact')
+    RepositoryContent = apps.get_model('core', 'RepositoryContent')
+
+    for publication in Publication.objects.filter(complete=True).iterator():
+        version = publication.repository_version
+        paths = chain(
+            (
+                PublishedPath(publication=publication, relative_path=path, content_artifact_id=pk)
+                for path, pk in publication.published_artifact.values_list(
+                    'relative_path', 'content_artifact_id').iterator()
+            ),
+            (
+                PublishedPath(publication=publication, relative_path=path, published_metadata_id=pk)
+                for path, pk in publication.published_metadata.values_list(
+                    'relative_path', 'pk').iterator()
+            ),
+        )
+        if publication.pass_through:
+            memberships = RepositoryContent.objects.filter(
+                repository_id=version.repository_id, version_added__number__lte=version.number
+            ).exclude(
+                version_removed__number__lte=version.number
+            )
+            paths = chain(paths, (
+                PublishedPath(publication=publication, relative_path=path, content_artifact_id=pk)
+                for path, pk in ContentArtifact.objects.filter(
+                    content__version_memberships__in=memberships
+                ).values_list('relative_path', 'pk').iterator()
+            ))
+        while True:
+            batch = list(islice(paths, BATCH_SIZE))
+            if not batch:
+                break
+            PublishedPath.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_cachegeneration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PublishedPath',
+            fields=[
+                ('_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('_created', models.DateTimeField(auto_now_add=True)),
+                ('_last_updated', models.DateTimeField(auto_now=True, null=True)),
+                ('relative_path', models.CharField(max_length=255)),
+                ('content_artifact', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='published_paths', to='core.ContentArtifact')),
+                ('publication', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='published_paths', to='core.Publication')),
+                ('published_metadata', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='published_paths', to='core.PublishedMetadata')),
+            ],
+            options={
+                'default_related_name': 'published_paths',
+                'unique_together': {('publication', 'relative_path')},
+            },
+        ),
+        migrations.RunPython(index_complete_publications, migrations.RunPython.noop),
+    ]
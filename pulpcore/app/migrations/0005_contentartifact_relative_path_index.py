@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-16 20:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_publishedpath'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contentartifact',
+            name='relative_path',
+            field=models.CharField(db_index=True, max_length=255),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 2.2.28 on 2026-10-16 20:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+import pulpcore.app.models.publication
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_contentartifact_relative_path_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CompressedMetadata',
+            fields=[
+                ('_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('_created', models.DateTimeField(auto_now_add=True)),
+                ('_last_updated', models.DateTimeField(auto_now=True, null=True)),
+                ('encoding', models.CharField(max_length=16)),
+                ('file', models.FileField(max_length=255, upload_to=pulpcore.app.models.publication.CompressedMetadata._storage_path)),
+                ('published_metadata', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='compressed_metadata', to='core.PublishedMetadata')),
+            ],
+            options={
+                'default_related_name': 'compressed_metadata',
+                'unique_together': {('published_metadata', 'encoding')},
+            },
+        ),
+    ]
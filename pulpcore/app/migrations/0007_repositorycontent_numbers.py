@@ -0,0 +1,51 @@
+# Generated by Django 2.2.28 on 2026-10-16 21:20
+
+from django.db import migrations, models
+
+
+def copy_version_numbers(apps, schema_editor):
+    """
+    Copy the numbers of the versions which added and removed content to the memberships.
+    """
+    RepositoryContent = apps.get_model('core', 'RepositoryContent')
+    RepositoryVersion = apps.get_model('core', 'RepositoryVersion')
+    RepositoryContent.objects.update(number_added=models.Subquery(
+        RepositoryVersion.objects.filter(pk=models.OuterRef('version_added')).values('number')
+    ))
+    RepositoryContent.objects.filter(version_removed__isnull=False).update(
+        number_removed=models.Subquery(
+            RepositoryVersion.objects.filter(
+                pk=models.OuterRef('version_removed')
+            ).values('number')
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_compressedmetadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repositorycontent',
+            name='number_added',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='repositorycontent',
+            name='number_removed',
+            field=models.PositiveIntegerField(null=True),
+        ),
+        migrations.RunPython(copy_version_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='repositorycontent',
+            name='number_added',
+            field=models.PositiveIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='repositorycontent',
+            index=models.Index(fields=['repository', 'number_added', 'number_removed'], name='core_repocontent_numbers_idx'),
+        ),
+    ]
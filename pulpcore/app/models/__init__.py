@@ -5,11 +5,13 @@ from .content import Artifact, Content, ContentArtifact, RemoteArtifact  # noqa
 from .generic import GenericRelationModel  # noqa
 from .publication import (  # noqa
     BaseDistribution,
+    CompressedMetadata,
     ContentGuard,
     Publication,
     PublicationDistribution,
     PublishedArtifact,
     PublishedMetadata,
+    PublishedPath,
     RepositoryVersionDistribution,
 )
 from .repository import (  # noqa
@@ -32,3 +34,5 @@ from .upload import (  # noqa
 
 # Moved here to avoid a circular import with Task
 from .progress import ProgressBar, ProgressReport, ProgressSpinner  # noqa
+
+from .cache import CacheGeneration  # noqa
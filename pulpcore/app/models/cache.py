@@ -0,0 +1,128 @@
+"""
+Django models used to keep the in-process caches of the Content App coherent.
+"""
+from django.db import IntegrityError, models, transaction
+from django.db.models.signals import class_prepared, post_delete, post_save
+from django.dispatch import receiver
+
+from pulpcore.app.models import (
+    BaseDistribution,
+    ContentGuard,
+    Model,
+    Publication,
+    Remote,
+    Repository,
+    RepositoryVersion,
+)
+
+
+class CacheGenerationManager(models.Manager):
+
+    def bump(self, name):
+        """
+        Increment the generation with the given name, creating it if needed.
+
+        The increment is deferred until the current transaction commits, so a reader never
+        observes a new generation before the change that caused it is visible.
+
+        Args:
+            name (str): The name of the generation to bump.
+        """
+        def _bump():
+            if self.filter(name=name).update(value=models.F('value') + 1):
+                return
+            try:
+                with transaction.atomic():
+                    self.create(name=name, value=1)
+            except IntegrityError:
+                # Created by a parallel writer in the meantime
+                self.filter(name=name).update(value=models.F('value') + 1)
+
+        transaction.on_commit(_bump)
+
+    def current(self):
+        """
+        Returns:
+            dict: The current value of every generation keyed by name.
+        """
+        return dict(self.values_list('name', 'value'))
+
+
+class CacheGeneration(Model):
+    """
+    A counter that is incremented whenever data cached by the Content App changes.
+
+    Content App processes compare the value they loaded their caches at against the stored one
+    and drop their caches when it has moved on.
+
+    Fields:
+
+        name (models.CharField): The name of the cached data set, e.g. ``distributions``.
+        value (models.BigIntegerField): The current generation.
+    """
+    DISTRIBUTIONS = 'distributions'
+    REPOSITORY_VERSIONS = 'repository_versions'
+
+    objects = CacheGenerationManager()
+
+    name = models.CharField(db_index=True, unique=True, max_length=255)
+    value = models.BigIntegerField(default=0)
+
+
+# The models whose changes, and the models whose deletion, change the cached distributions
+DISTRIBUTION_MODELS = (BaseDistribution, ContentGuard, Remote)
+REFERENCED_MODELS = (Publication, Repository, RepositoryVersion)
+
+
+def _invalidate_distributions(sender, instance, **kwargs):
+    """
+    Bump the distributions generation when a distribution or anything it references changes.
+
+    Deleting a referenced object updates distributions with SET_NULL without calling their
+    `save()`, so the deletion of the referenced object itself has to be caught.
+    """
+    CacheGeneration.objects.bump(CacheGeneration.DISTRIBUTIONS)
+
+
+def _connect_invalidation(model):
+    """
+    Connect `_invalidate_distributions` to the signals of a model, when it is concerned.
+
+    Signals are connected per model rather than for all of them, so saving and deleting other
+    models doesn't run it.
+    """
+    if issubclass(model, DISTRIBUTION_MODELS):
+        post_save.connect(_invalidate_distributions, sender=model)
+        post_delete.connect(_invalidate_distributions, sender=model)
+    elif issubclass(model, REFERENCED_MODELS):
+        post_delete.connect(_invalidate_distributions, sender=model)
+
+
+@receiver(class_prepared)
+def _connect_subclass_invalidation(sender, **kwargs):
+    """
+    Connect the models of plugins, e.g. the detail models of distributions and remotes.
+    """
+    _connect_invalidation(sender)
+
+
+def _subclasses(model):
+    for subclass in model.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+for model in DISTRIBUTION_MODELS + REFERENCED_MODELS:
+    _connect_invalidation(model)
+    for subclass in _subclasses(model):
+        _connect_invalidation(subclass)
+
+
+@receiver(post_save, sender=RepositoryVersion)
+@receiver(post_delete, sender=RepositoryVersion)
+def _invalidate_latest_versions(sender, instance, **kwargs):
+    """
+    Bump the repository versions generation when a version is completed or deleted.
+    """
+    if kwargs.get('signal') is post_delete or instance.complete:
+        CacheGeneration.objects.bump(CacheGeneration.REPOSITORY_VERSIONS)
@@ -288,7 +288,7 @@ class ContentArtifact(Model, QueryMixin):
     """
     artifact = models.ForeignKey(Artifact, on_delete=models.PROTECT, null=True)
     content = models.ForeignKey(Content, on_delete=models.CASCADE)
-    relative_path = models.CharField(max_length=255)
+    relative_path = models.CharField(max_length=255, db_index=True)
 
     objects = BulkCreateManager()
 
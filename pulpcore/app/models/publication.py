@@ -1,7 +1,16 @@
+from itertools import chain, islice
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
 from django.db import models, transaction
 
+from pulpcore.app.compression import get_compressor, is_compressed, SUFFIXES
+
 from . import storage
 from .base import MasterModel, Model
+from .content import ContentArtifact
 from .repository import Remote, Repository, RepositoryVersion
 from .task import CreatedResource
 
@@ -11,9 +20,10 @@ class Publication(MasterModel):
     A publication contains metadata and artifacts associated with content
     contained within a RepositoryVersion.
 
-    Using as a context manager is highly encouraged.  On context exit, the complete attribute
-    is set True provided that an exception has not been raised.  In the event and exception
-    has been raised, the publication is deleted.
+    Using as a context manager is highly encouraged.  On context exit, the complete attribute is set
+    True provided that an exception has not been raised.  In the event and exception has been
+    raised, the publication is deleted.  The paths served by the publication are indexed when it is
+    first saved complete.
 
     Fields:
         complete (models.BooleanField): State tracking; for internal use. Indexed.
@@ -42,6 +52,12 @@ class Publication(MasterModel):
     """
     TYPE = 'publication'
 
+    # The number of PublishedPath rows inserted per query by index_paths().
+    INDEX_BATCH_SIZE = 1000
+
+    # Metadata files smaller than this (in bytes) are not compressed by compress_metadata().
+    COMPRESS_MIN_SIZE = 1024
+
     complete = models.BooleanField(db_index=True, default=False)
     pass_through = models.BooleanField(default=False)
 
@@ -93,6 +109,21 @@ class Publication(MasterModel):
         """
         return self.repository_version.repository
 
+    def save(self, *args, **kwargs):
+        """
+        Save the publication.
+
+        The paths served by the publication are indexed when it is saved complete for the first
+        time, whether or not it is used as a context manager.
+        """
+        with transaction.atomic():
+            index = self.complete and not Publication.objects.filter(
+                pk=self.pk, complete=True
+            ).exists()
+            super().save(*args, **kwargs)
+            if index:
+                self.index_paths()
+
     def delete(self, **kwargs):
         """
         Delete the publication.
@@ -107,6 +138,84 @@ class Publication(MasterModel):
             CreatedResource.objects.filter(object_id=self.pk).delete()
             super().delete(**kwargs)
 
+    def index_paths(self):
+        """
+        Create the :class:`PublishedPath` rows of everything served by this publication.
+
+        Paths are indexed in the order the content app used to look them up: published artifacts
+        first, then published metadata and then, for pass-through publications, the content
+        artifacts of the repository version. The first file indexed for a path wins.
+        """
+        paths = chain(
+            (
+                PublishedPath(publication=self, relative_path=path, content_artifact_id=ca_pk)
+                for path, ca_pk in self.published_artifact.values_list(
+                    'relative_path', 'content_artifact_id'
+                ).iterator()
+            ),
+            (
+                PublishedPath(publication=self, relative_path=path, published_metadata_id=pm_pk)
+                for path, pm_pk in self.published_metadata.values_list(
+                    'relative_path', 'pk'
+                ).iterator()
+            ),
+        )
+        if self.pass_through:
+            content_artifacts = ContentArtifact.objects.filter(
+                content__in=self.repository_version.content
+            ).values_list('relative_path', 'pk')
+            paths = chain(paths, (
+                PublishedPath(publication=self, relative_path=path, content_artifact_id=ca_pk)
+                for path, ca_pk in content_artifacts.iterator()
+            ))
+
+        while True:
+            batch = list(islice(paths, self.INDEX_BATCH_SIZE))
+            if not batch:
+                break
+            PublishedPath.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def compress_metadata(self, encodings=None):
+        """
+        Store compressed copies of the published metadata files as :class:`CompressedMetadata`.
+
+        The Content App serves a compressed copy to clients accepting its encoding. Files which
+        are already compressed, smaller than ``COMPRESS_MIN_SIZE`` or which do not get smaller
+        are left alone.
+
+        Args:
+            encodings (list): The content codings to compress with, defaults to
+                ``PUBLISHED_METADATA_ENCODINGS``.
+
+        Raises:
+            ImproperlyConfigured: When an encoding is not supported.
+        """
+        if encodings is None:
+            encodings = settings.PUBLISHED_METADATA_ENCODINGS
+        compressors = [(encoding, get_compressor(encoding)) for encoding in encodings]
+        if not compressors:
+            return
+        for metadata in self.published_metadata.iterator():
+            name = metadata.file.name
+            if is_compressed(name):
+                continue
+            size = metadata.file.size
+            if size < self.COMPRESS_MIN_SIZE:
+                continue
+            for encoding, compress in compressors:
+                with metadata.file.storage.open(name, 'rb') as src, \
+                        tempfile.TemporaryFile() as dst:
+                    compress(src, dst)
+                    if dst.tell() >= size:
+                        continue
+                    dst.seek(0)
+                    compressed_name = os.path.basename(name) + SUFFIXES[encoding]
+                    CompressedMetadata.objects.create(
+                        published_metadata=metadata,
+                        encoding=encoding,
+                        file=File(dst, name=compressed_name),
+                    )
+
     def __enter__(self):
         """
         Enter context.
@@ -118,7 +227,11 @@ class Publication(MasterModel):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
-        Set the complete=True, create the publication.
+        Compress the metadata, index the published paths, set the complete=True, create the
+        publication.
+
+        The publication and its compressed metadata files are deleted when an exception was raised
+        in the context or when completing the publication fails.
 
         Args:
             exc_type (Type): (optional) Type of exception raised.
@@ -126,8 +239,18 @@ class Publication(MasterModel):
             exc_tb (types.TracebackType): (optional) stack trace.
         """
         if not exc_val:
-            self.complete = True
-            self.save()
+            try:
+                self.compress_metadata()
+                self.complete = True
+                self.save()
+            except Exception:
+                compressed_metadata = CompressedMetadata.objects.filter(
+                    published_metadata__publication=self
+                )
+                for compressed in compressed_metadata.iterator():
+                    compressed.file.delete(save=False)
+                self.delete()
+                raise
         else:
             self.delete()
 
@@ -189,6 +312,54 @@ class PublishedMetadata(PublishedFile):
         )
 
 
+class CompressedMetadata(Model):
+    """
+    A compressed copy of a published metadata file.
+
+    Created by :meth:`Publication.compress_metadata` for the Content App to serve to clients
+    accepting the encoding.
+
+    Fields:
+        encoding (models.CharField): The content coding of the file, e.g. 'gzip' or 'br'.
+        file (models.FileField): The stored compressed file.
+
+    Relations:
+        published_metadata (models.ForeignKey): The metadata compressed.
+    """
+
+    def _storage_path(self, name):
+        return storage.published_metadata_path(self, name)
+
+    encoding = models.CharField(max_length=16)
+    file = models.FileField(upload_to=_storage_path, max_length=255)
+
+    published_metadata = models.ForeignKey(PublishedMetadata, on_delete=models.CASCADE)
+
+    class Meta:
+        default_related_name = 'compressed_metadata'
+        unique_together = ('published_metadata', 'encoding')
+
+
+class PublishedPath(PublishedFile):
+    """
+    An index of what a complete publication serves at each relative path.
+
+    Rows are created by :meth:`Publication.index_paths` when the publication is completed, so the
+    content app can resolve a path with a single indexed lookup.
+
+    Relations:
+        content_artifact (models.ForeignKey): The content artifact served at the path, if any.
+        published_metadata (models.ForeignKey): The metadata served at the path, if any.
+    """
+    content_artifact = models.ForeignKey('ContentArtifact', null=True, on_delete=models.CASCADE)
+    published_metadata = models.ForeignKey(PublishedMetadata, null=True,
+                                           on_delete=models.CASCADE)
+
+    class Meta:
+        default_related_name = 'published_paths'
+        unique_together = ('publication', 'relative_path')
+
+
 class ContentGuard(MasterModel):
     """
     Defines a named content guard.
@@ -201,6 +372,23 @@ class ContentGuard(MasterModel):
     name = models.CharField(max_length=255, db_index=True, unique=True)
     description = models.TextField(null=True)
 
+    def get_permit_cache_key(self, request):
+        """
+        Get the key the result of `permit()` for a request can be cached with.
+
+        Guards whose decision only depends on a credential of the request, e.g. a client
+        certificate or a token, can return a digest of it. The Content App then reuses the
+        decision for ``CONTENT_APP_PERMIT_CACHE_TTL`` seconds instead of calling `permit()` for
+        every request.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): A request for a published file.
+
+        Returns:
+            A hashable key, or None to call `permit()` for every request (the default).
+        """
+        return None
+
 
 class BaseDistribution(MasterModel):
     """
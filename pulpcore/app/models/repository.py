@@ -2,16 +2,20 @@
 Repository related Django models.
 """
 from contextlib import suppress
+from gettext import gettext as _
+from itertools import islice
 
 import django
-from django.db import models, transaction
+from django.core.exceptions import EmptyResultSet
+from django.db import connection, models, transaction
 from django.urls import reverse
+from django.utils import timezone
 
 from pulpcore.app.util import get_view_name_for_model
 from pulpcore.exceptions import ResourceImmutableError
 
 from .base import MasterModel, Model
-from .content import Content
+from .content import Content, ContentArtifact
 from .task import CreatedResource
 
 
@@ -156,9 +160,15 @@ class RepositoryContent(Model):
     """
     Association between a repository and its contained content.
 
+    The numbers of the versions which added and removed the content are stored along with the
+    versions, so the content of a version is found with a single indexed range predicate,
+    `number_added <= number < number_removed`, instead of joining the versions.
+
     Fields:
 
         created (models.DatetimeField): When the association was created.
+        number_added (models.PositiveIntegerField): The number of `version_added`.
+        number_removed (models.PositiveIntegerField): The number of `version_removed`, if any.
 
     Relations:
 
@@ -169,6 +179,9 @@ class RepositoryContent(Model):
         version_removed (models.ForeignKey): The RepositoryVersion which removed the referenced
             Content.
     """
+    number_added = models.PositiveIntegerField()
+    number_removed = models.PositiveIntegerField(null=True)
+
     content = models.ForeignKey('Content', on_delete=models.CASCADE,
                                 related_name='version_memberships')
     repository = models.ForeignKey(Repository, on_delete=models.CASCADE)
@@ -181,6 +194,33 @@ class RepositoryContent(Model):
     class Meta:
         unique_together = (('repository', 'content', 'version_added'),
                            ('repository', 'content', 'version_removed'))
+        indexes = [
+            models.Index(fields=['repository', 'number_added', 'number_removed'],
+                         name='core_repocontent_numbers_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        """
+        Set the version numbers from the versions, when not given.
+        """
+        if self.number_added is None:
+            self.number_added = self.version_added.number
+        if self.number_removed is None and self.version_removed_id:
+            self.number_removed = self.version_removed.number
+        return super().save(*args, **kwargs)
+
+    @staticmethod
+    def in_version(number):
+        """
+        Args:
+            number (int): The number of a repository version.
+
+        Returns:
+            django.db.models.Q: The filter of the memberships of the version with that number.
+        """
+        return models.Q(number_added__lte=number) & (
+            models.Q(number_removed__isnull=True) | models.Q(number_removed__gt=number)
+        )
 
 
 class RepositoryVersion(Model):
@@ -210,6 +250,18 @@ class RepositoryVersion(Model):
 
         repository (models.ForeignKey): The associated repository.
     """
+    # SQL generating the primary keys of the RepositoryContent inserted by add_content(), by
+    # database vendor. Content is added in batches of CONTENT_BATCH_SIZE on other databases.
+    UUID_SQL = {
+        'postgresql': 'md5(random()::text || clock_timestamp()::text)::uuid',
+        'mysql': "REPLACE(UUID(), '-', '')",
+        'sqlite': 'lower(hex(randomblob(16)))',
+    }
+    CONTENT_BATCH_SIZE = 1000
+
+    # The temporary table of the content differing from the base version, see _copy_content().
+    DIFFERENCE_TABLE = 'core_repositoryversion_difference'
+
     repository = models.ForeignKey(Repository, on_delete=models.CASCADE)
     number = models.PositiveIntegerField(db_index=True)
     complete = models.BooleanField(db_index=True, default=False)
@@ -242,9 +294,7 @@ class RepositoryVersion(Model):
             >>>
         """
         relationships = RepositoryContent.objects.filter(
-            repository=self.repository, version_added__number__lte=self.number
-        ).exclude(
-            version_removed__number__lte=self.number
+            RepositoryContent.in_version(self.number), repository=self.repository_id
         )
         return Content.objects.filter(version_memberships__in=relationships)
 
@@ -271,6 +321,33 @@ class RepositoryVersion(Model):
         """
         return self.content.filter(pk=content.pk).exists()
 
+    def get_content_artifact(self, relative_path):
+        """
+        Get the ContentArtifact at a relative path in this repository version.
+
+        The ContentArtifacts are found by the index on `relative_path` first, then each is checked
+        for membership through the index on the repository and content of RepositoryContent, so
+        the lookup does not scan the content of the version.
+
+        Args:
+            relative_path (str): The relative path of the ContentArtifact.
+
+        Returns:
+            pulpcore.app.models.ContentArtifact: The ContentArtifact, with its artifact selected.
+
+        Raises:
+            ContentArtifact.DoesNotExist: if there is no ContentArtifact at the path.
+            ContentArtifact.MultipleObjectsReturned: if several ContentArtifacts are at the path.
+        """
+        memberships = RepositoryContent.objects.filter(
+            RepositoryContent.in_version(self.number),
+            repository=self.repository_id,
+            content=models.OuterRef('content'),
+        )
+        return ContentArtifact.objects.select_related('artifact').annotate(
+            in_version=models.Exists(memberships)
+        ).get(relative_path=relative_path, in_version=True)
+
     @classmethod
     def create(cls, repository, base_version=None):
         """
@@ -296,10 +373,7 @@ class RepositoryVersion(Model):
             version.save()
 
             if base_version:
-                # first remove the content that isn't in the base version
-                version.remove_content(version.content.exclude(pk__in=base_version.content))
-                # now add any content that's in the base_version but not in version
-                version.add_content(base_version.content.exclude(pk__in=version.content))
+                version._copy_content(base_version)
 
             resource = CreatedResource(content_object=version)
             resource.save()
@@ -337,10 +411,30 @@ class RepositoryVersion(Model):
         except IndexError:
             raise self.DoesNotExist
 
+    def previous(self):
+        """
+        Returns:
+            pulpcore.app.models.RepositoryVersion: The previous RepositoryVersion with the same
+                repository.
+
+        Raises:
+            RepositoryVersion.DoesNotExist: if there is not a RepositoryVersion for the same
+                repository and with a lower "number".
+        """
+        try:
+            return self.repository.versions.exclude(complete=False).filter(
+                number__lt=self.number).order_by('-number')[0]
+        except IndexError:
+            raise self.DoesNotExist
+
     def add_content(self, content):
         """
         Add a content unit to this version.
 
+        The memberships are inserted with a single ``INSERT ... SELECT`` on the databases of
+        `UUID_SQL`, so the content is never loaded in Python. On other databases the pks of the
+        content are streamed and the memberships are created in batches.
+
         Args:
            content (django.db.models.QuerySet): Set of Content to add
 
@@ -351,17 +445,161 @@ class RepositoryVersion(Model):
         if self.complete:
             raise ResourceImmutableError(self)
 
-        repo_content = []
-        for content_pk in content.exclude(pk__in=self.content).values_list('pk', flat=True):
-            repo_content.append(
-                RepositoryContent(
-                    repository=self.repository,
-                    content_id=content_pk,
-                    version_added=self
-                )
+        content = Content.objects.filter(pk__in=content).exclude(pk__in=self.content)
+        if connection.vendor in self.UUID_SQL:
+            try:
+                select_sql, select_params = content.values('pk').query.sql_with_params()
+            except EmptyResultSet:
+                # e.g. filtered by an empty list of pks
+                return
+            self._insert_memberships(select_sql, select_params, Content._meta.pk.column)
+        else:
+            self._create_content(content)
+
+    def _insert_memberships(self, select_sql, select_params, column):
+        """
+        Add content with an ``INSERT ... SELECT`` of the memberships.
+
+        Args:
+            select_sql (str): A query selecting the pks of the content to add.
+            select_params (tuple): The parameters of the query.
+            column (str): The column of the pks selected by the query.
+        """
+        meta = RepositoryContent._meta
+        fields = [meta.get_field(name) for name in (
+            '_created', '_last_updated', 'repository', 'version_added', 'number_added'
+        )]
+        now = timezone.now()
+        values = [
+            field.get_db_prep_value(value, connection)
+            for field, value in zip(fields, (now, now, self.repository_id, self.pk, self.number))
+        ]
+        quote = connection.ops.quote_name
+        sql = (
+            'INSERT INTO {table} ({pk}, {columns}, {content}) '
+            'SELECT {uuid}, {values}, added.{column} FROM ({select}) added'
+        ).format(
+            table=quote(meta.db_table),
+            pk=quote(meta.pk.column),
+            columns=', '.join(quote(field.column) for field in fields),
+            content=quote(meta.get_field('content').column),
+            uuid=self.UUID_SQL[connection.vendor],
+            values=', '.join(['%s'] * len(values)),
+            column=quote(column),
+            select=select_sql,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, values + list(select_params))
+
+    def _create_content(self, content):
+        """
+        Add content by creating the memberships in batches.
+        """
+        pks = content.values_list('pk', flat=True).iterator(chunk_size=self.CONTENT_BATCH_SIZE)
+        while True:
+            batch = list(islice(pks, self.CONTENT_BATCH_SIZE))
+            if not batch:
+                break
+            self._create_memberships(batch)
+
+    def _create_memberships(self, content_pks):
+        RepositoryContent.objects.bulk_create([
+            RepositoryContent(
+                repository_id=self.repository_id,
+                content_id=content_pk,
+                version_added=self,
+                number_added=self.number,
             )
+            for content_pk in content_pks
+        ])
 
-        RepositoryContent.objects.bulk_create(repo_content)
+    def _copy_content(self, base_version):
+        """
+        Make the content of this new version the content of `base_version`.
+
+        The memberships of the repository and of `base_version` are grouped by content in a single
+        query selecting only the content to remove and to add. On the databases of `UUID_SQL` the
+        result is kept in a temporary table the memberships are updated and inserted from, on
+        other databases it is applied in batches of CONTENT_BATCH_SIZE.
+
+        Args:
+            base_version (pulpcore.app.models.RepositoryVersion): The version to copy the content
+                of, possibly of another repository.
+        """
+        current = RepositoryContent.objects.filter(
+            repository_id=self.repository_id, version_removed=None
+        ).values('content_id')
+        base = RepositoryContent.objects.filter(
+            RepositoryContent.in_version(base_version.number),
+            repository_id=base_version.repository_id,
+        ).values('content_id')
+        current_sql, current_params = current.query.sql_with_params()
+        base_sql, base_params = base.query.sql_with_params()
+        column = RepositoryContent._meta.get_field('content').column
+        quote = connection.ops.quote_name
+        # The content only in the repository has a side of 1, the one only in base_version of 0
+        sql = (
+            'SELECT {content}, MIN({side}) AS {side} FROM ('
+            'SELECT {content}, 1 AS {side} FROM ({current}) current_memberships UNION ALL '
+            'SELECT {content}, 0 AS {side} FROM ({base}) base_memberships'
+            ') memberships GROUP BY {content} HAVING MIN({side}) = MAX({side})'
+        ).format(
+            content=quote(column),
+            side=quote('side'),
+            current=current_sql,
+            base=base_sql,
+        )
+        params = current_params + base_params
+
+        with connection.cursor() as cursor:
+            if connection.vendor not in self.UUID_SQL:
+                cursor.execute(sql, params)
+                while True:
+                    rows = cursor.fetchmany(self.CONTENT_BATCH_SIZE)
+                    if not rows:
+                        break
+                    removed = [content_pk for content_pk, side in rows if side]
+                    if removed:
+                        self.remove_content(removed)
+                    added = [content_pk for content_pk, side in rows if not side]
+                    if added:
+                        self._create_memberships(added)
+                return
+
+            table = quote(self.DIFFERENCE_TABLE)
+            # MySQL commits the transaction on DROP TABLE unless it is told the table is temporary
+            drop = 'DROP {}TABLE IF EXISTS {}'.format(
+                'TEMPORARY ' if connection.vendor == 'mysql' else '', table
+            )
+            # A table left over by a failed version in this session on MySQL, where it is not
+            # dropped by the rollback
+            cursor.execute(drop)
+            cursor.execute('CREATE TEMPORARY TABLE {} AS {}'.format(table, sql), params)
+            difference = 'SELECT {content} FROM {table} WHERE {side} = %s'.format(
+                content=quote(column), table=table, side=quote('side')
+            )
+            meta = RepositoryContent._meta
+            fields = [meta.get_field(name) for name in (
+                'version_removed', 'number_removed', 'repository'
+            )]
+            values = [
+                field.get_db_prep_value(value, connection)
+                for field, value in zip(fields, (self.pk, self.number, self.repository_id))
+            ]
+            cursor.execute(
+                'UPDATE {table} SET {removed} = %s, {number} = %s WHERE {repository} = %s '
+                'AND {removed} IS NULL AND {content} IN ({difference})'.format(
+                    table=quote(meta.db_table),
+                    removed=quote(fields[0].column),
+                    number=quote(fields[1].column),
+                    repository=quote(fields[2].column),
+                    content=quote(column),
+                    difference=difference,
+                ),
+                values + [1],
+            )
+            self._insert_memberships(difference, (0,), column)
+            cursor.execute(drop)
 
     def remove_content(self, content):
         """
@@ -382,7 +620,7 @@ class RepositoryVersion(Model):
             repository=self.repository,
             content_id__in=content,
             version_removed=None)
-        q_set.update(version_removed=self)
+        q_set.update(version_removed=self, number_removed=self.number)
 
     def _squash(self, repo_relations, next_version):
         """
@@ -404,14 +642,16 @@ class RepositoryVersion(Model):
 
         repo_relations.filter(version_removed=self,
                               content_id__in=content_removed_and_readded)\
-            .update(version_removed=None)
+            .update(version_removed=None, number_removed=None)
 
         repo_relations.filter(version_added=next_version,
                               content_id__in=content_removed_and_readded).delete()
 
         # "squash" by moving other additions and removals forward to the next version
-        repo_relations.filter(version_added=self).update(version_added=next_version)
-        repo_relations.filter(version_removed=self).update(version_removed=next_version)
+        repo_relations.filter(version_added=self).update(version_added=next_version,
+                                                         number_added=next_version.number)
+        repo_relations.filter(version_removed=self).update(version_removed=next_version,
+                                                           number_removed=next_version.number)
 
     def delete(self, **kwargs):
         """
@@ -433,19 +673,123 @@ class RepositoryVersion(Model):
                 # version is the latest version so simply update repo contents
                 # and delete the version
                 repo_relations.filter(version_added=self).delete()
-                repo_relations.filter(version_removed=self).update(version_removed=None)
+                repo_relations.filter(version_removed=self).update(version_removed=None,
+                                                                   number_removed=None)
             super().delete(**kwargs)
 
         else:
             with transaction.atomic():
                 RepositoryContent.objects.filter(version_added=self).delete()
                 RepositoryContent.objects.filter(version_removed=self) \
-                    .update(version_removed=None)
+                    .update(version_removed=None, number_removed=None)
                 CreatedResource.objects.filter(object_id=self.pk).delete()
                 self.repository.last_version = self.number - 1
                 self.repository.save()
                 super().delete(**kwargs)
 
+    @classmethod
+    def delete_range(cls, repository, first, last):
+        """
+        Delete the complete versions of a repository numbered from `first` to `last`.
+
+        The changes of the versions are squashed into the next version, as by delete(), with the
+        same few statements whatever the number of versions, so the content of the other versions
+        stays the same. Without a next version the changes are reverted.
+
+        Deletion of RepositoryVersions should be done in a RQ Job.
+
+        Args:
+            repository (pulpcore.app.models.Repository): The repository of the versions.
+            first (int): The number of the first version to delete.
+            last (int): The number of the last version to delete.
+
+        Raises:
+            ValueError: When an incomplete version is numbered after the first version to delete
+                and before the next complete version, if any.
+
+        Returns:
+            list: The numbers of the deleted versions.
+        """
+        with transaction.atomic():
+            versions = repository.versions.exclude(complete=False).filter(
+                number__gte=first, number__lte=last)
+            numbers = list(versions.order_by('number').values_list('number', flat=True))
+            if not numbers:
+                return numbers
+
+            # Only the changes of the deleted versions are squashed or reverted, and none of the
+            # changes of incomplete versions
+            first, last = numbers[0], numbers[-1]
+            next_version = repository.versions.exclude(complete=False).filter(
+                number__gt=last).order_by('number').first()
+            incomplete = repository.versions.filter(complete=False, number__gt=first)
+            if next_version is not None:
+                incomplete = incomplete.filter(number__lt=next_version.number)
+            if incomplete.exists():
+                raise ValueError(_('Incomplete versions of repository {repo} are numbered after '
+                                   'version {first}, before the next complete version.').format(
+                    repo=repository.name, first=first
+                ))
+
+            repo_relations = RepositoryContent.objects.filter(repository=repository)
+            added = repo_relations.filter(number_added__gte=first, number_added__lte=last)
+            removed = repo_relations.filter(number_removed__gte=first, number_removed__lte=last)
+
+            if next_version is None:
+                added.delete()
+                removed.update(version_removed=None, number_removed=None)
+            else:
+                cls._squash_range(repo_relations, first, last, next_version)
+
+            versions.delete()
+            if next_version is not None:
+                next_version.compute_counts()
+            return numbers
+
+    @staticmethod
+    def _squash_range(repo_relations, first, last, next_version):
+        """
+        Squash the versions numbered from `first` to `last` into the next version.
+        """
+        added = repo_relations.filter(number_added__gte=first, number_added__lte=last)
+        removed = repo_relations.filter(number_removed__gte=first, number_removed__lte=last)
+
+        # delete the relationships added in the range and removed in it or in the next version
+        added.filter(number_removed__lte=next_version.number).delete()
+
+        # Content removed in the range and added back in it or in the next version keeps the
+        # relationship from before the range, which takes the removal of the relationship adding
+        # it back. The relationships adding it back are loaded first, as MySQL can't update or
+        # delete rows of a table selected in a subquery.
+        readded = {}
+        rows = repo_relations.filter(
+            number_added__gte=first,
+            number_added__lte=next_version.number,
+            content__in=removed.filter(number_added__lt=first).values('content'),
+        ).values_list('content_id', 'pk', 'number_removed', 'version_removed_id')
+        for content_id, pk, number_removed, version_removed_id in rows.iterator():
+            readded[content_id] = (pk, number_removed, version_removed_id)
+
+        content_ids = iter(readded)
+        while True:
+            batch = list(islice(content_ids, RepositoryVersion.CONTENT_BATCH_SIZE))
+            if not batch:
+                break
+            # The relationships adding the content back are deleted first, the versions removing
+            # the content would not be unique before
+            repo_relations.filter(pk__in=[readded[content_id][0] for content_id in batch]).delete()
+            removals = {}
+            for content_id in batch:
+                removals.setdefault(readded[content_id][1:], []).append(content_id)
+            for (number_removed, version_removed_id), removed_ids in removals.items():
+                removed.filter(number_added__lt=first, content_id__in=removed_ids).update(
+                    number_removed=number_removed, version_removed_id=version_removed_id
+                )
+
+        # "squash" by moving other additions and removals forward to the next version
+        added.update(version_added=next_version, number_added=next_version.number)
+        removed.update(version_removed=next_version, number_removed=next_version.number)
+
     def compute_counts(self):
         """
         Compute and save content unit counts by type.
@@ -453,28 +797,54 @@ class RepositoryVersion(Model):
         Count records are stored as :class:`~pulpcore.app.models.RepositoryVersionContentDetails`.
         This method deletes existing :class:`~pulpcore.app.models.RepositoryVersionContentDetails`
         objects and makes new ones with each call.
+
+        The content present is counted as the content present in the previous version plus the
+        content added minus the content removed, so only the changes of the version are counted.
+        It is counted from the content of the version when the previous version has no counts.
         """
+        added = self._count_by_type(self.added())
+        removed = self._count_by_type(self.removed())
+        present = {}
+        with suppress(RepositoryVersion.DoesNotExist):
+            previous_counts = self.previous().counts.values_list(
+                'count_type', 'content_type', 'count'
+            )
+            present = {
+                content_type: count for count_type, content_type, count in previous_counts
+                if count_type == RepositoryVersionContentDetails.PRESENT
+            } if previous_counts else None
+
+        if present is None:
+            present = self._count_by_type(self.content)
+        else:
+            for content_type, count in added.items():
+                present[content_type] = present.get(content_type, 0) + count
+            for content_type, count in removed.items():
+                present[content_type] = present.get(content_type, 0) - count
+
+        counts_list = [
+            RepositoryVersionContentDetails(
+                content_type=content_type,
+                repository_version=self,
+                count=count,
+                count_type=count_type,
+            )
+            for count_type, counts in (
+                (RepositoryVersionContentDetails.ADDED, added),
+                (RepositoryVersionContentDetails.PRESENT, present),
+                (RepositoryVersionContentDetails.REMOVED, removed),
+            )
+            for content_type, count in counts.items()
+            if count > 0
+        ]
         with transaction.atomic():
-            counts_list = []
-            for value, name in RepositoryVersionContentDetails.COUNT_TYPE_CHOICES:
-                RepositoryVersionContentDetails.objects.filter(repository_version=self).delete()
-                if value == RepositoryVersionContentDetails.ADDED:
-                    qs = self.added()
-                elif value == RepositoryVersionContentDetails.PRESENT:
-                    qs = self.content
-                elif value == RepositoryVersionContentDetails.REMOVED:
-                    qs = self.removed()
-                annotated = qs.values('_type').annotate(count=models.Count('_type'))
-                for item in annotated:
-                    count_obj = RepositoryVersionContentDetails(
-                        content_type=item['_type'],
-                        repository_version=self,
-                        count=item['count'],
-                        count_type=value,
-                    )
-                    counts_list.append(count_obj)
+            RepositoryVersionContentDetails.objects.filter(repository_version=self).delete()
             RepositoryVersionContentDetails.objects.bulk_create(counts_list)
 
+    @staticmethod
+    def _count_by_type(content):
+        return dict(content.values_list('_type').annotate(count=models.Count('_type')))
+
     def __enter__(self):
         """
         Create the repository version
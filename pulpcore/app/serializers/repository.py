@@ -275,3 +275,21 @@ class RepositoryVersionCreateSerializer(ModelSerializer, NestedHyperlinkedModelS
     class Meta:
         model = models.RepositoryVersion
         fields = ['add_content_units', 'remove_content_units', 'base_version']
+
+
+class RepositoryVersionDeleteRangeSerializer(serializers.Serializer):
+    first = serializers.IntegerField(
+        help_text=_('The number of the first repository version to delete.'),
+        min_value=0,
+    )
+    last = serializers.IntegerField(
+        help_text=_('The number of the last repository version to delete.'),
+        min_value=0,
+    )
+
+    def validate(self, data):
+        if data['first'] > data['last']:
+            raise serializers.ValidationError(
+                _("The first version to delete cannot be after the last one.")
+            )
+        return data
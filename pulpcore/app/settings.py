@@ -204,6 +204,30 @@ LOGGING = {
 CONTENT_HOST = ''
 CONTENT_PATH_PREFIX = '/pulp/content/'
 CONTENT_APP_TTL = 30
+CONTENT_APP_WORKERS = 1
+CONTENT_APP_CACHE_REFRESH_INTERVAL = 2
+CONTENT_APP_DB_POOL_SIZE = 10
+CONTENT_APP_PATH_CACHE_SIZE = 100000
+CONTENT_APP_PATH_CACHE_MEMORY = 64 * 1024 * 1024
+CONTENT_APP_MISSING_PATH_CACHE_SIZE = 100000
+CONTENT_APP_MISSING_PATH_CACHE_MEMORY = 32 * 1024 * 1024
+CONTENT_APP_PERMIT_CACHE_SIZE = 10000
+CONTENT_APP_PERMIT_CACHE_TTL = 60
+CONTENT_APP_SHARED_DOWNLOAD_BUFFER = 16 * 1024 * 1024
+CONTENT_APP_HEDGE_DELAY = None
+CONTENT_APP_SAVE_QUEUE_SIZE = 100
+CONTENT_APP_SAVE_WORKERS = 2
+CONTENT_APP_SENDFILE = True
+CONTENT_APP_FILE_CHUNK_SIZE = 1024 * 1024
+CONTENT_APP_FILE_RESPONDER = None
+CONTENT_APP_PRESIGNED_URL_CACHE_SIZE = 10000
+CONTENT_APP_LOCAL_CACHE_DIR = os.path.join(MEDIA_ROOT, 'content-cache/')
+CONTENT_APP_LOCAL_CACHE_SIZE = 10 * 1024 * 1024 * 1024
+CONTENT_APP_LIMITS = {}
+CONTENT_APP_LIMIT_QUEUE_TIMEOUT = 5
+CONTENT_APP_METRICS_PATH = None
+
+PUBLISHED_METADATA_ENCODINGS = []
 
 REMOTE_USER_ENVIRON_NAME = "REMOTE_USER"
 
@@ -66,6 +66,26 @@ def delete_version(pk):
         version.delete()
 
 
+def delete_versions(repository_pk, first, last):
+    """
+    Delete the versions of a repository numbered from `first` to `last` by squashing their changes
+    with the next newer version in a single transaction. This ensures that the content set for
+    each version left stays the same.
+
+    Args:
+        repository_pk (int): the primary key for the Repository of the versions
+        first (int): the number of the first version to delete
+        last (int): the number of the last version to delete
+    """
+    repository = models.Repository.objects.get(pk=repository_pk)
+    numbers = models.RepositoryVersion.delete_range(repository, first, last)
+    if numbers:
+        log.info(_('Deleted and squashed versions %(v)s of repository %(r)s'),
+                 {'v': ', '.join(str(number) for number in numbers), 'r': repository.name})
+    else:
+        log.info(_('No repository version was found. Nothing to do.'))
+
+
 def add_and_remove(repository_pk, add_content_units, remove_content_units, base_version_pk=None):
     """
     Create a new repository version by adding and then removing content units.
@@ -5,6 +5,7 @@ from django_filters import Filter
 from django_filters.rest_framework import DjangoFilterBackend, filters
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import mixins, serializers
+from rest_framework.decorators import list_route
 from rest_framework.filters import OrderingFilter
 
 from pulpcore.app import tasks
@@ -26,6 +27,7 @@ from pulpcore.app.serializers import (
     RemoteSerializer,
     RepositorySerializer,
     RepositoryVersionCreateSerializer,
+    RepositoryVersionDeleteRangeSerializer,
     RepositoryVersionSerializer,
 )
 from pulpcore.app.viewsets import (
@@ -135,12 +137,12 @@ class RepositoryVersionContentFilter(Filter):
                                                                   repository=repository)
 
         # Get the sorted list of version_added and version_removed.
-        version_added = list(repository_content_set.values_list('version_added__number', flat=True))
+        version_added = list(repository_content_set.values_list('number_added', flat=True))
 
         # None values have to be filtered out from version_removed,
         # in order for zip_longest to pass it a default fillvalue
         version_removed = list(filter(None.__ne__, repository_content_set
-                                      .values_list('version_removed__number', flat=True)))
+                                      .values_list('number_removed', flat=True)))
 
         # The range finding should work as long as both lists are sorted
         # Why it works: https://gist.github.com/werwty/6867f83ae5adbae71e452c28ecd9c444
@@ -214,6 +216,29 @@ class RepositoryVersionViewSet(NamedModelViewSet,
         )
         return OperationPostponedResponse(async_result, request)
 
+    @swagger_auto_schema(operation_description="Trigger an asynchronous task to delete "
+                                               "the repository versions numbered from first to "
+                                               "last.",
+                         request_body=RepositoryVersionDeleteRangeSerializer,
+                         responses={202: AsyncOperationResponseSerializer})
+    @list_route(methods=('post',))
+    def delete_range(self, request, repository_pk):
+        """
+        Queues a task to handle deletion of a range of RepositoryVersions
+        """
+        repository = self.get_parent_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        async_result = enqueue_with_reservation(
+            tasks.repository.delete_versions, [repository],
+            kwargs={
+                'repository_pk': repository.pk,
+                'first': serializer.validated_data['first'],
+                'last': serializer.validated_data['last'],
+            }
+        )
+        return OperationPostponedResponse(async_result, request)
+
     @swagger_auto_schema(operation_description="Trigger an asynchronous task to create "
                                                "a new repository version.",
                          responses={202: AsyncOperationResponseSerializer})
@@ -259,6 +284,8 @@ class RepositoryVersionViewSet(NamedModelViewSet,
     def get_serializer_class(self):
         if self.action == 'create':
             return RepositoryVersionCreateSerializer
+        if self.action == 'delete_range':
+            return RepositoryVersionDeleteRangeSerializer
         return RepositoryVersionSerializer
 
 
@@ -4,26 +4,35 @@ from gettext import gettext as _
 from importlib import import_module
 import logging
 import os
+import signal
 import socket
+import time
 
 import django  # noqa otherwise E402: module level not at top of file
 django.setup()  # noqa otherwise E402: module level not at top of file
 
 from aiohttp import web
 from django.conf import settings
+from django.db import connections
 
 from pulpcore.app.apps import pulp_plugin_configs
 from pulpcore.app.models import ContentAppStatus
 
+from .cache import distribution_cache
 from .handler import Handler
+from .metrics import metrics_middleware, metrics_view
+from .persistence import artifact_saver
 
 
 log = logging.getLogger(__name__)
 
-app = web.Application()
+app = web.Application(middlewares=[metrics_middleware])
 
 CONTENT_MODULE_NAME = 'content'
 
+# Seconds waited before replacing a worker process which exited
+WORKER_RESTART_DELAY = 1
+
 
 async def _heartbeat():
     name = '{pid}@{hostname}'.format(pid=os.getpid(), hostname=socket.gethostname())
@@ -39,13 +48,113 @@ async def _heartbeat():
         await asyncio.sleep(heartbeat_interval)
 
 
+async def _finish_saves(app):
+    if artifact_saver.pending:
+        log.info(_("Waiting for {count} pull-through artifacts to be saved").format(
+            count=artifact_saver.pending
+        ))
+        await artifact_saver.join()
+
+
 async def server(*args, **kwargs):
     asyncio.ensure_future(_heartbeat())
+    app.on_shutdown.append(_finish_saves)
     for pulp_plugin in pulp_plugin_configs():
         if pulp_plugin.name != "pulpcore.app":
             content_module_name = '{name}.{module}'.format(name=pulp_plugin.name,
                                                            module=CONTENT_MODULE_NAME)
             with suppress(ModuleNotFoundError):
                 import_module(content_module_name)
+    if settings.CONTENT_APP_METRICS_PATH:
+        app.add_routes([web.get(settings.CONTENT_APP_METRICS_PATH, metrics_view)])
     app.add_routes([web.get(settings.CONTENT_PATH_PREFIX + '{path:.+}', Handler().stream_content)])
     return app
+
+
+def _bind(host, port):
+    """
+    Create the listening sockets of a worker, one for each address `host` resolves to.
+
+    Args:
+        host (str): The address to listen on, or None for all the addresses of the host.
+        port (int): The port to listen on.
+
+    Returns:
+        list: The bound sockets.
+    """
+    socks = []
+    for family, type_, proto, canonname, address in socket.getaddrinfo(
+            host, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE):
+        sock = socket.socket(family, type_, proto)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        # Every worker binds its own socket, the kernel balances the connections between them
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        if family == socket.AF_INET6:
+            # The IPv4 addresses get their own socket
+            sock.setsockopt(socket.IPPROTO_IPV6, socket.IPV6_V6ONLY, 1)
+        sock.bind(address)
+        socks.append(sock)
+    return socks
+
+
+def run(host=None, port=24816, workers=None):
+    """
+    Run the Content App, optionally in several worker processes.
+
+    Workers share the port through ``SO_REUSEPORT`` and each writes its own heartbeat. The
+    distributions are loaded before forking, so the workers start with them cached. Workers
+    exiting are replaced until the Content App is stopped.
+
+    Args:
+        host (str): The address to listen on, all the addresses of the host by default.
+        port (int): The port to listen on.
+        workers (int): The number of worker processes. Defaults to ``CONTENT_APP_WORKERS``.
+    """
+    workers = workers or settings.CONTENT_APP_WORKERS
+    if workers <= 1:
+        web.run_app(server(), host=host, port=port)
+        return
+
+    distribution_cache.preload()
+    # The workers must open their own database connections
+    connections.close_all()
+
+    def start_worker():
+        pid = os.fork()
+        if pid == 0:
+            # The worker must never return into the code of the parent
+            try:
+                signal.signal(signal.SIGINT, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                web.run_app(server(), sock=_bind(host, port))
+            except BaseException:
+                log.exception(_("Content App worker {pid} failed").format(pid=os.getpid()))
+                os._exit(1)
+            else:
+                os._exit(0)
+        return pid
+
+    pids = [start_worker() for i in range(workers)]
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            with suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    while pids:
+        pid, status = os.wait()
+        pids.remove(pid)
+        if stopping:
+            continue
+        log.warning(_("Content App worker {pid} exited with status {status}, restarting it").format(
+            pid=pid, status=status
+        ))
+        # Don't fork continuously when workers fail on start
+        time.sleep(WORKER_RESTART_DELAY)
+        if not stopping:
+            pids.append(start_worker())
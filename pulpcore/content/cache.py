@@ -0,0 +1,518 @@
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+
+from pulpcore.app.models import (
+    BaseDistribution,
+    CacheGeneration,
+    Publication,
+    RepositoryVersion,
+)
+
+
+#: Stored in caches for lookups that did not match anything.
+NOT_FOUND = object()
+
+
+class LRUCache:
+    """
+    A thread-safe least recently used cache bounded by a number of entries and a memory size.
+
+    Memory is accounted for with the size given when an entry is set, so it is as accurate as
+    the estimate of the caller.
+    """
+
+    def __init__(self, max_entries, max_memory=0):
+        """
+        Args:
+            max_entries (int): The maximum number of entries. 0 disables the cache.
+            max_memory (int): The maximum memory in bytes taken by the entries. 0 means unbounded.
+        """
+        self.max_entries = max_entries
+        self.max_memory = max_memory
+        self.memory = 0
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of lookups that hit and missed, and the entries and memory cached.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._data),
+            'memory': self.memory,
+        }
+
+    def get(self, key, default=None):
+        """
+        Get an entry and mark it as the most recently used.
+
+        Args:
+            key: The key of the entry.
+            default: The value returned when the key is not cached.
+
+        Returns:
+            The cached value or `default`.
+        """
+        with self._lock:
+            try:
+                value, size = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, size=0):
+        """
+        Cache an entry, evicting the least recently used ones when over the limits.
+
+        Args:
+            key: The key of the entry.
+            value: The value to cache.
+            size (int): The estimated memory taken by the entry in bytes.
+        """
+        if not self.max_entries:
+            return
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old:
+                self.memory -= old[1]
+            self._data[key] = (value, size)
+            self.memory += size
+            while len(self._data) > self.max_entries or \
+                    (self.max_memory and self.memory > self.max_memory):
+                self.memory -= self._data.popitem(last=False)[1][1]
+
+    def keys(self):
+        """
+        Returns:
+            list: The keys of the cached entries, least recently used first.
+        """
+        with self._lock:
+            return list(self._data)
+
+    def discard(self, predicate):
+        """
+        Drop every entry with a key matching a predicate.
+
+        Args:
+            predicate (callable): Called with each key, entries are dropped when True.
+        """
+        with self._lock:
+            for key in [key for key in self._data if predicate(key)]:
+                self.memory -= self._data.pop(key)[1]
+
+    def clear(self):
+        """
+        Drop every entry.
+        """
+        with self._lock:
+            self._data.clear()
+            self.memory = 0
+
+
+class GenerationWatcher:
+    """
+    Reads the :class:`~pulpcore.app.models.CacheGeneration` values for the Content App caches.
+
+    The values are read at most once every ``CONTENT_APP_CACHE_REFRESH_INTERVAL`` seconds and
+    shared by all the caches of the process.
+    """
+
+    def __init__(self):
+        self._current = {}
+        self._checked = None
+
+    def get(self, name):
+        """
+        Args:
+            name (str): The name of the generation.
+
+        Returns:
+            int: The last read value of the generation, or None when it was never bumped.
+        """
+        now = time.monotonic()
+        if self._checked is None or \
+                now - self._checked >= settings.CONTENT_APP_CACHE_REFRESH_INTERVAL:
+            self._checked = now
+            self._current = CacheGeneration.objects.current()
+        return self._current.get(name)
+
+
+generations = GenerationWatcher()
+
+
+class GenerationCache:
+    """
+    Base class for caches invalidated through a :class:`~pulpcore.app.models.CacheGeneration`.
+
+    Subclasses set `generation_name`, implement `invalidate()` and call `check()` before using
+    their cached data.
+    """
+
+    generation_name = None
+
+    def __init__(self):
+        self._generation = None
+
+    def check(self):
+        """
+        Invalidate the cache if its generation moved on since it was last checked.
+        """
+        generation = generations.get(self.generation_name)
+        if generation != self._generation:
+            self._generation = generation
+            self.invalidate()
+
+    def invalidate(self):
+        """
+        Drop the cached data that might have changed.
+        """
+        raise NotImplementedError()
+
+
+class BasePathTrie:
+    """
+    A trie of distributions keyed by the components of their ``base_path``.
+
+    Base paths of distributions never overlap, so the first distribution found while walking down
+    the components of a request path is the only one that can match.
+    """
+
+    def __init__(self):
+        self.root = {}
+
+    def insert(self, base_path, distribution):
+        """
+        Add a distribution to the trie.
+
+        Args:
+            base_path (str): The base path of the distribution.
+            distribution (detail of BaseDistribution): The distribution to store.
+        """
+        node = self.root
+        for component in base_path.strip('/').split('/'):
+            node = node.setdefault(component, {})
+        # components are never empty, so None marks the end of a base path
+        node[None] = distribution
+
+    def match(self, path):
+        """
+        Find the distribution whose base path is a directory of the path.
+
+        The last component of the path is a file, unless the path ends with a slash, so
+        ``base/path/`` matches the distribution of ``base/path`` but ``base/path`` does not.
+
+        Args:
+            path (str): The path component of the URL.
+
+        Returns:
+            detail of BaseDistribution: The matched distribution, or None when not matched.
+        """
+        components = path.strip('/').split('/')
+        if not path.endswith('/'):
+            components = components[:-1]
+        node = self.root
+        for component in components:
+            node = node.get(component)
+            if node is None:
+                return None
+            if None in node:
+                return node[None]
+        return None
+
+
+class DistributionCache(GenerationCache):
+    """
+    An in-process cache of detail distributions used to match request paths without queries.
+
+    A trie is built per distribution model on first use. All of them are dropped when the
+    ``distributions`` :class:`~pulpcore.app.models.CacheGeneration` moves on.
+    """
+
+    generation_name = CacheGeneration.DISTRIBUTIONS
+
+    def __init__(self):
+        super().__init__()
+        self._tries = {}
+
+    def invalidate(self):
+        """
+        Drop every cached distribution.
+        """
+        self._tries = {}
+
+    def preload(self):
+        """
+        Load every distribution into the cache.
+        """
+        self.check()
+        self._tries[BaseDistribution] = self._build(BaseDistribution)
+
+    def match(self, path, model=None):
+        """
+        Match a distribution using the base paths of the cached distributions.
+
+        Args:
+            path (str): The path component of the URL.
+            model (class): The distribution model to match. Defaults to all detail distributions
+                in :class:`~pulpcore.app.models.BaseDistribution`.
+
+        Returns:
+            detail of BaseDistribution: The matched distribution, or None when not matched.
+        """
+        self.check()
+        model = model or BaseDistribution
+        trie = self._tries.get(model)
+        if trie is None:
+            trie = self._tries[model] = self._build(model)
+        return trie.match(path)
+
+    @staticmethod
+    def _build(model):
+        trie = BasePathTrie()
+        for distribution in model.objects.all():
+            if model is BaseDistribution:
+                distribution = distribution.cast()
+            # Cast once here instead of for every request
+            if distribution.content_guard_id:
+                distribution.content_guard = distribution.content_guard.cast()
+            if distribution.remote_id:
+                distribution.remote = distribution.remote.cast()
+            trie.insert(distribution.base_path, distribution)
+        return trie
+
+
+distribution_cache = DistributionCache()
+
+
+class LatestVersionCache(GenerationCache):
+    """
+    A cache of the latest complete version of the repositories served by distributions.
+
+    Every cached version is dropped when the ``repository_versions``
+    :class:`~pulpcore.app.models.CacheGeneration` moves on, which happens whenever a version is
+    completed or deleted.
+    """
+
+    generation_name = CacheGeneration.REPOSITORY_VERSIONS
+
+    def __init__(self):
+        super().__init__()
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of lookups that hit and missed, and the versions cached.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._versions)}
+
+    def invalidate(self):
+        """
+        Drop every cached version.
+        """
+        self._versions = {}
+
+    def get(self, repository):
+        """
+        Args:
+            repository (:class:`~pulpcore.app.models.Repository`): The repository.
+
+        Returns:
+            :class:`~pulpcore.app.models.RepositoryVersion`: The latest complete version of the
+                repository, or None when it has none.
+        """
+        self.check()
+        try:
+            version = self._versions[repository.pk]
+        except KeyError:
+            self.misses += 1
+            version = self._versions[repository.pk] = RepositoryVersion.latest(repository)
+        else:
+            self.hits += 1
+        return version
+
+
+latest_version_cache = LatestVersionCache()
+
+
+class PermitCache(GenerationCache):
+    """
+    A cache of the decisions of content guards, for guards that opt in.
+
+    Decisions are cached for ``CONTENT_APP_PERMIT_CACHE_TTL`` seconds by the key returned by
+    :meth:`~pulpcore.app.models.ContentGuard.get_permit_cache_key`. All of them are dropped when
+    the ``distributions`` :class:`~pulpcore.app.models.CacheGeneration` moves on, which happens
+    whenever a content guard changes.
+    """
+
+    generation_name = CacheGeneration.DISTRIBUTIONS
+
+    def __init__(self, max_entries):
+        """
+        Args:
+            max_entries (int): The maximum number of cached decisions. 0 disables the cache.
+        """
+        super().__init__()
+        self._lru = LRUCache(max_entries)
+
+    def stats(self):
+        """
+        Returns:
+            dict: The statistics of the cached decisions, see :meth:`LRUCache.stats`.
+        """
+        return self._lru.stats()
+
+    def invalidate(self):
+        """
+        Drop every cached decision.
+        """
+        self._lru.clear()
+
+    def get(self, guard, key):
+        """
+        Args:
+            guard (detail of :class:`~pulpcore.app.models.ContentGuard`): The guard.
+            key: The key returned by the guard for the request.
+
+        Returns:
+            tuple: Whether the guard permitted the request and the reason it did not, or None
+                when no decision is cached.
+        """
+        self.check()
+        cached = self._lru.get((guard.pk, key))
+        if cached and cached[2] > time.monotonic():
+            return cached[:2]
+        return None
+
+    def set(self, guard, key, permitted, reason=''):
+        """
+        Args:
+            guard (detail of :class:`~pulpcore.app.models.ContentGuard`): The guard.
+            key: The key returned by the guard for the request.
+            permitted (bool): Whether the guard permitted the request.
+            reason (str): Why the guard did not permit the request.
+        """
+        expires = time.monotonic() + settings.CONTENT_APP_PERMIT_CACHE_TTL
+        self._lru.set((guard.pk, key), (permitted, reason, expires))
+
+
+permit_cache = PermitCache(settings.CONTENT_APP_PERMIT_CACHE_SIZE)
+
+
+class PublishedPathCache(GenerationCache):
+    """
+    A cache of what complete publications serve at a relative path, including misses.
+
+    Complete publications are immutable, so entries never go stale while the publication exists.
+    Entries of deleted publications are dropped when the ``distributions``
+    :class:`~pulpcore.app.models.CacheGeneration` moves on, which happens on every publication
+    deletion.
+    """
+
+    generation_name = CacheGeneration.DISTRIBUTIONS
+
+    # An estimate of the memory taken by an entry besides its strings.
+    ENTRY_OVERHEAD = 400
+
+    def __init__(self, max_entries, max_memory=0):
+        """
+        Args:
+            max_entries (int): The maximum number of cached paths. 0 disables the cache.
+            max_memory (int): The maximum memory in bytes taken by the cached paths.
+        """
+        super().__init__()
+        self._lru = LRUCache(max_entries, max_memory)
+
+    def __len__(self):
+        return len(self._lru)
+
+    def stats(self):
+        """
+        Returns:
+            dict: The statistics of the cached paths, see :meth:`LRUCache.stats`.
+        """
+        return self._lru.stats()
+
+    def invalidate(self):
+        """
+        Drop the entries of the publications that no longer exist.
+        """
+        cached = {publication_pk for publication_pk, rel_path in self._lru.keys()}
+        if not cached:
+            return
+        existing = set(Publication.objects.filter(pk__in=cached).values_list('pk', flat=True))
+        self._lru.discard(lambda key: key[0] not in existing)
+
+    def get(self, publication, rel_path):
+        """
+        Args:
+            publication (:class:`~pulpcore.app.models.Publication`): The served publication.
+            rel_path (str): The path relative to the distribution base path.
+
+        Returns:
+            The cached :class:`~pulpcore.content.handler.ServedFile`, `NOT_FOUND` for a cached
+            miss or None when nothing is cached.
+        """
+        if not publication.complete:
+            return None
+        self.check()
+        return self._lru.get((publication.pk, rel_path))
+
+    def set(self, publication, rel_path, served_file):
+        """
+        Args:
+            publication (:class:`~pulpcore.app.models.Publication`): The served publication.
+            rel_path (str): The path relative to the distribution base path.
+            served_file (:class:`~pulpcore.content.handler.ServedFile`): The file served at the
+                path, or `NOT_FOUND`.
+        """
+        if not publication.complete:
+            return
+        size = self.ENTRY_OVERHEAD + len(rel_path)
+        if served_file is not NOT_FOUND:
+            for f in (served_file,) + tuple(v for e, v in served_file.variants):
+                size += len(f.file.name) + len(f.etag)
+            size += self.ENTRY_OVERHEAD * len(served_file.variants)
+        self._lru.set((publication.pk, rel_path), served_file, size)
+
+
+published_path_cache = PublishedPathCache(
+    settings.CONTENT_APP_PATH_CACHE_SIZE, settings.CONTENT_APP_PATH_CACHE_MEMORY
+)
+
+
+class MissingPathCache(LRUCache):
+    """
+    The paths distributions do not serve, see :meth:`pulpcore.content.Handler._missing_path_key`.
+    """
+
+    # An estimate of the memory taken by an entry besides its path.
+    ENTRY_OVERHEAD = 300
+
+    def add(self, key):
+        """
+        Args:
+            key (tuple): The key of the missing path, its last item being the path.
+        """
+        self.set(key, True, self.ENTRY_OVERHEAD + len(key[-1]))
+
+
+missing_path_cache = MissingPathCache(
+    settings.CONTENT_APP_MISSING_PATH_CACHE_SIZE, settings.CONTENT_APP_MISSING_PATH_CACHE_MEMORY
+)
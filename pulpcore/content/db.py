@@ -0,0 +1,44 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+
+
+_executor = None
+
+
+def get_executor():
+    """
+    Get the executor used by the Content App to run blocking database calls.
+
+    The executor is created on first use with ``CONTENT_APP_DB_POOL_SIZE`` threads. Django keeps
+    one database connection per thread, so this also bounds the number of database connections
+    held by each Content App process.
+
+    Returns:
+        :class:`concurrent.futures.ThreadPoolExecutor`: The executor.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.CONTENT_APP_DB_POOL_SIZE,
+            thread_name_prefix='pulp-content-db'
+        )
+    return _executor
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Run a blocking callable, e.g. one using the Django ORM, without blocking the event loop.
+
+    Args:
+        func (callable): The callable to run in the database executor.
+        args (tuple): Positional arguments for the callable.
+        kwargs (dict): Keyword arguments for the callable.
+
+    Returns:
+        The value returned by the callable.
+    """
+    loop = asyncio.get_event_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
@@ -0,0 +1,303 @@
+import asyncio
+from gettext import gettext as _
+import inspect
+import logging
+
+from .db import run_sync
+
+
+log = logging.getLogger(__name__)
+
+
+class SubscriptionOverflow(Exception):
+    """
+    A subscriber fell too far behind a shared download and was dropped.
+    """
+    pass
+
+
+class Subscription:
+    """
+    The data of a :class:`SharedDownload` as received by one request.
+    """
+
+    def __init__(self):
+        self.pending = 0
+        self._queue = asyncio.Queue()
+
+    def put(self, item):
+        self._queue.put_nowait(item)
+        if isinstance(item, bytes):
+            self.pending += len(item)
+
+    async def read(self):
+        """
+        Returns:
+            bytes: The next chunk of data, or b'' once the download is finished.
+
+        Raises:
+            Exception: The exception the download failed with.
+        """
+        item = await self._queue.get()
+        if isinstance(item, Exception):
+            raise item
+        self.pending -= len(item)
+        return item
+
+
+class SharedDownload:
+    """
+    A download from a remote whose data is fanned out to every request waiting for it.
+
+    Requests can subscribe until more than `max_buffer` bytes were received, the data received so
+    far is replayed to them. Subscribers that fall more than `max_buffer` bytes behind are dropped
+    so a stalled client cannot make the download buffer unbounded data.
+    """
+
+    def __init__(self, max_buffer):
+        """
+        Args:
+            max_buffer (int): The maximum number of bytes kept in memory for a subscriber.
+        """
+        self.headers = asyncio.get_event_loop().create_future()
+        self.task = None
+        self.joinable = True
+        self._max_buffer = max_buffer
+        self._buffer = []
+        self._buffered = 0
+        self._subscribers = []
+
+    def subscribe(self):
+        """
+        Returns:
+            :class:`Subscription`: The subscription, or None when the download can't be joined
+                anymore.
+        """
+        if not self.joinable:
+            return None
+        subscription = Subscription()
+        for chunk in self._buffer:
+            subscription.put(chunk)
+        self._subscribers.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stop sending data to a subscriber.
+        """
+        if subscription in self._subscribers:
+            self._subscribers.remove(subscription)
+
+    def abandon(self, subscription):
+        """
+        Stop sending data to a subscriber, cancelling the download if it was the last one.
+        """
+        self.unsubscribe(subscription)
+        if not self._subscribers and self.task is not None:
+            self.joinable = False
+            self.task.cancel()
+
+    def publish_headers(self, headers):
+        """
+        Args:
+            headers (multidict.CIMultiDictProxy): The headers of the remote response.
+        """
+        self.headers.set_result(headers)
+
+    def publish(self, data):
+        """
+        Args:
+            data (bytes): The next chunk of data received from the remote.
+        """
+        if self.joinable:
+            self._buffer.append(data)
+            self._buffered += len(data)
+            if self._buffered > self._max_buffer:
+                self.joinable = False
+                self._buffer = []
+        for subscription in list(self._subscribers):
+            if subscription.pending > self._max_buffer:
+                self.unsubscribe(subscription)
+                subscription.put(SubscriptionOverflow(
+                    _('The client fell too far behind the remote download.')
+                ))
+            else:
+                subscription.put(data)
+
+    def finish(self, exc=None):
+        """
+        Signal the end of the download to the subscribers.
+
+        Args:
+            exc (Exception): The exception the download failed with, if it failed.
+        """
+        self.joinable = False
+        self._buffer = []
+        if not self.headers.done():
+            if exc:
+                self.headers.set_exception(exc)
+                # Retrieve it so it is not reported when no request is waiting anymore
+                self.headers.exception()
+            else:
+                self.headers.set_result({})
+        for subscription in self._subscribers:
+            subscription.put(exc or b'')
+        self._subscribers = []
+
+
+class RemoteStats:
+    """
+    The latency and error rate of the remotes, to try the best remotes first.
+
+    Both are exponentially weighted moving averages, so recent downloads matter most.
+    """
+
+    # The weight of the latest download in the averages.
+    WEIGHT = 0.2
+
+    def __init__(self):
+        self._stats = {}
+
+    def record(self, remote_pk, latency, failed=False):
+        """
+        Args:
+            remote_pk: The pk of the remote.
+            latency (float): The seconds it took the remote to respond with headers, or fail.
+            failed (bool): Whether the download failed before the remote responded.
+        """
+        error = 1.0 if failed else 0.0
+        stats = self._stats.get(remote_pk)
+        if stats is None:
+            self._stats[remote_pk] = (latency, error)
+        else:
+            self._stats[remote_pk] = (
+                stats[0] + self.WEIGHT * (latency - stats[0]),
+                stats[1] + self.WEIGHT * (error - stats[1]),
+            )
+
+    def get(self, remote_pk):
+        """
+        Returns:
+            tuple: The average latency in seconds and error rate of the remote, or None when no
+                download from it was recorded.
+        """
+        return self._stats.get(remote_pk)
+
+    def items(self):
+        """
+        Returns:
+            list: The (remote pk, (latency, error rate)) of the remotes with recorded downloads.
+        """
+        return list(self._stats.items())
+
+    def sort(self, remote_artifacts):
+        """
+        Args:
+            remote_artifacts (list): The :class:`~pulpcore.plugin.models.RemoteArtifact` to sort.
+
+        Returns:
+            list: The RemoteArtifacts, by increasing error rate and then latency of their remote.
+                Remotes without recorded downloads come first, so they get tried.
+        """
+        def key(remote_artifact):
+            latency, error = self._stats.get(remote_artifact.remote_id, (0.0, 0.0))
+            return (error, latency)
+        return sorted(remote_artifacts, key=key)
+
+
+remote_stats = RemoteStats()
+
+
+#: The downloads in progress, keyed by remote pk and url.
+shared_downloads = {}
+
+
+class PooledRemote:
+    """
+    A detail remote shared by the downloads from it.
+
+    Attributes:
+        remote (:class:`~pulpcore.plugin.models.Remote`): The detail remote.
+        users (int): The number of downloads using the remote.
+        retired (bool): Whether the remote was replaced by a newer version of it.
+    """
+
+    def __init__(self, remote):
+        self.remote = remote
+        self.users = 0
+        self.retired = False
+
+
+class RemotePool:
+    """
+    The detail remotes used for on-demand downloads, shared across requests.
+
+    The download factory of a remote holds an aiohttp ClientSession configured from the remote,
+    with its ``download_concurrency``, ``proxy_url`` and TLS settings. Sharing the remote instance
+    between downloads lets them reuse the connections of that session. When the remote was
+    updated, a new instance is used and the session of the old one is closed once the downloads
+    using it are finished.
+    """
+
+    def __init__(self):
+        self._remotes = {}
+
+    async def acquire(self, remote):
+        """
+        Args:
+            remote (:class:`~pulpcore.plugin.models.Remote`): The remote as loaded for the request,
+                used to detect changes through its ``_last_updated``.
+
+        Returns:
+            :class:`PooledRemote`: The shared remote, to `release()` once the download is done.
+        """
+        pooled = self._remotes.get(remote.pk)
+        if pooled is None or pooled.remote._last_updated != remote._last_updated:
+            detail = await run_sync(remote.cast)
+            # Another request might have replaced it in the meantime
+            pooled = self._remotes.get(remote.pk)
+            if pooled is None or pooled.remote._last_updated != detail._last_updated:
+                if pooled is not None:
+                    pooled.retired = True
+                    if not pooled.users:
+                        await self._close(pooled.remote)
+                pooled = self._remotes[remote.pk] = PooledRemote(detail)
+        pooled.users += 1
+        return pooled
+
+    async def release(self, pooled):
+        """
+        Args:
+            pooled (:class:`PooledRemote`): The remote returned by `acquire()`.
+        """
+        pooled.users -= 1
+        if pooled.retired and not pooled.users:
+            await self._close(pooled.remote)
+
+    @staticmethod
+    async def _close(remote):
+        """
+        Close the session of the download factory of a retired remote.
+
+        The factory is created by the plugin API on first use of ``Remote.download_factory``.
+        It is closed with its ``close()`` when it has one, or else its session is closed.
+        """
+        factory = remote.__dict__.get('_download_factory')
+        if factory is None:
+            # Nothing was downloaded with the remote
+            return
+        close = getattr(factory, 'close', None)
+        if close is None:
+            session = getattr(factory, 'session', None) or getattr(factory, '_session', None)
+            close = getattr(session, 'close', None)
+        if close is None:
+            log.warning(_("The download session of remote '{name}' could not be closed").format(
+                name=remote.name
+            ))
+            return
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+
+
+remote_pool = RemotePool()
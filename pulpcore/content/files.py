@@ -0,0 +1,137 @@
+import asyncio
+from contextlib import suppress
+import mimetypes
+import mmap
+import os
+
+from aiohttp.web import StreamResponse
+from aiohttp.web_exceptions import HTTPRequestRangeNotSatisfiable
+from django.conf import settings
+
+
+# Added in Python 3.7, along with loop.sendfile()
+SendfileNotAvailableError = getattr(asyncio, 'SendfileNotAvailableError', NotImplementedError)
+
+
+class FileSender:
+    """
+    Serves files of the local filesystem, with support for Range requests.
+
+    The file is sent with ``os.sendfile()`` through :meth:`asyncio.AbstractEventLoop.sendfile`
+    so the data goes from the page cache to the socket without being copied through Python. When
+    sendfile is disabled or not available, e.g. for TLS connections or on Python 3.6, the file is
+    memory-mapped and written in chunks of ``chunk_size`` bytes.
+    """
+
+    def __init__(self, use_sendfile=True, chunk_size=1024 * 1024):
+        """
+        Args:
+            use_sendfile (bool): Whether to try sending files with ``os.sendfile()``.
+            chunk_size (int): The size in bytes of the chunks written when not using sendfile.
+        """
+        self.use_sendfile = use_sendfile
+        self.chunk_size = chunk_size
+
+    @classmethod
+    def from_settings(cls):
+        """
+        Returns:
+            :class:`FileSender`: A sender configured with ``CONTENT_APP_SENDFILE`` and
+                ``CONTENT_APP_FILE_CHUNK_SIZE``.
+        """
+        return cls(settings.CONTENT_APP_SENDFILE, settings.CONTENT_APP_FILE_CHUNK_SIZE)
+
+    async def respond(self, request, path, headers=None):
+        """
+        Send a file as the response to a request.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request for the file.
+            path (str): The absolute path of the file.
+            headers (dict): Additional headers of the response. The content type is guessed
+                from the path unless given.
+
+        Raises:
+            :class:`aiohttp.web_exceptions.HTTPRequestRangeNotSatisfiable`: When the requested
+                range is outside of the file.
+            FileNotFoundError: When the file does not exist.
+
+        Returns:
+            :class:`aiohttp.web.StreamResponse`: The response, already sent.
+        """
+        loop = asyncio.get_event_loop()
+        fobj = await loop.run_in_executor(None, open, path, 'rb')
+        try:
+            size = os.fstat(fobj.fileno()).st_size
+            response = StreamResponse(headers=headers)
+            if 'Content-Type' not in response.headers:
+                response.content_type = \
+                    mimetypes.guess_type(path)[0] or 'application/octet-stream'
+
+            offset, count = self.apply_range(request, response, size)
+            response.content_length = count
+            await response.prepare(request)
+            if request.method != 'HEAD' and count:
+                if not (self.use_sendfile and await self._sendfile(request, fobj, offset, count)):
+                    await self._write_mapped(response, fobj, offset, count)
+            await response.write_eof()
+            return response
+        finally:
+            fobj.close()
+
+    @staticmethod
+    def apply_range(request, response, size):
+        """
+        Set up a response for the byte range requested in the ``Range`` header of a request.
+
+        Unparseable ``Range`` headers are ignored and the whole file is sent.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request for the file.
+            response (:class:`aiohttp.web.StreamResponse`): The response not prepared yet. Its
+                status and ``Content-Range`` are set for a satisfiable range.
+            size (int): The size in bytes of the file.
+
+        Raises:
+            :class:`aiohttp.web_exceptions.HTTPRequestRangeNotSatisfiable`: When the requested
+                range is outside of the file.
+
+        Returns:
+            tuple: The offset and the number of bytes of the file to send.
+        """
+        response.headers['Accept-Ranges'] = 'bytes'
+        requested_range = None
+        if 'Range' in request.headers:
+            with suppress(ValueError):
+                requested_range = request.http_range
+        if not requested_range:
+            return 0, size
+        start, stop, step = requested_range.indices(size)
+        if start >= stop:
+            raise HTTPRequestRangeNotSatisfiable(
+                headers={'Content-Range': 'bytes */{}'.format(size)}
+            )
+        response.set_status(206)
+        response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(start, stop - 1, size)
+        return start, stop - start
+
+    @staticmethod
+    async def _sendfile(request, fobj, offset, count):
+        """
+        Returns:
+            bool: Whether the file was sent, False when sendfile is not available.
+        """
+        loop = asyncio.get_event_loop()
+        if not hasattr(loop, 'sendfile'):
+            return False
+        try:
+            await loop.sendfile(request.transport, fobj, offset, count, fallback=False)
+        except (NotImplementedError, SendfileNotAvailableError):
+            return False
+        return True
+
+    async def _write_mapped(self, response, fobj, offset, count):
+        with mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            end = offset + count
+            for position in range(offset, end, self.chunk_size):
+                await response.write(mapped[position:min(position + self.chunk_size, end)])
@@ -1,25 +1,53 @@
+import asyncio
+from collections import namedtuple
+from contextlib import suppress
 import logging
+import math
+import mimetypes
 import os
+import time
 from gettext import gettext as _
 
 import django  # noqa otherwise E402: module level not at top of file
 django.setup()  # noqa otherwise E402: module level not at top of file
 
 from aiohttp.client_exceptions import ClientResponseError
-from aiohttp.web import FileResponse, StreamResponse
-from aiohttp.web_exceptions import HTTPForbidden, HTTPFound, HTTPNotFound
+from aiohttp.web import FileResponse, Response, StreamResponse
+from aiohttp.web_exceptions import (
+    HTTPForbidden,
+    HTTPFound,
+    HTTPNotFound,
+    HTTPTooManyRequests,
+)
 from django.conf import settings
 from django.core.exceptions import MultipleObjectsReturned, ObjectDoesNotExist
 from django.db import IntegrityError, transaction
+from django.utils.functional import cached_property
+from django.utils.http import http_date
+from pulpcore.app.compression import ENCODINGS
 from pulpcore.app.models import (
     Artifact,
     BaseDistribution,
     ContentArtifact,
     Remote,
     RemoteArtifact,
-    RepositoryVersion,
 )
 
+from .cache import (
+    NOT_FOUND,
+    distribution_cache,
+    latest_version_cache,
+    missing_path_cache,
+    permit_cache,
+    published_path_cache,
+)
+from .db import run_sync
+from .downloads import SharedDownload, remote_pool, remote_stats, shared_downloads
+from .limits import RateLimited, client_limiter, distribution_limiter, remote_limiter
+from .metrics import lookup_seconds, rate_limited, stage_seconds
+from .persistence import artifact_saver
+from .responders import get_file_responder
+
 
 log = logging.getLogger(__name__)
 
@@ -45,6 +73,65 @@ class ArtifactNotFound(Exception):
     pass
 
 
+class ServedFile(namedtuple('ServedFile', ['file', 'etag', 'last_modified', 'variants'])):
+    """
+    A stored file resolved for a request along with its cache validators.
+
+    Only the storage name of the file is kept, so instances are cheap to cache.
+
+    Attributes:
+        file (:class:`django.db.models.fields.files.FieldFile`): The file to serve.
+        etag (str): A strong entity tag of the file.
+        last_modified (datetime.datetime): When the file was stored.
+        variants (tuple): The (encoding, :class:`ServedFile`) pairs of the compressed copies of
+            the file, in the order they are preferred.
+    """
+    __slots__ = ()
+
+    def __new__(cls, file, etag, last_modified, variants=()):
+        return super().__new__(cls, file, etag, last_modified, variants)
+
+    @staticmethod
+    def _slim(file):
+        return file.field.attr_class(None, file.field, file.name)
+
+    @classmethod
+    def for_artifact(cls, artifact):
+        """
+        Args:
+            artifact (:class:`~pulpcore.plugin.models.Artifact`): The artifact to serve.
+
+        Returns:
+            ServedFile: The artifact file tagged with its sha256 digest.
+        """
+        return cls(cls._slim(artifact.file), '"{}"'.format(artifact.sha256), artifact._created)
+
+    @classmethod
+    def for_published_metadata(cls, published_metadata):
+        """
+        Args:
+            published_metadata (:class:`~pulpcore.plugin.models.PublishedMetadata`): The metadata
+                to serve.
+
+        Returns:
+            ServedFile: The metadata file tagged with the (immutable) metadata id, along with its
+                compressed copies.
+        """
+        compressed = sorted(
+            published_metadata.compressed_metadata.all(),
+            key=lambda c: ENCODINGS.index(c.encoding)
+        )
+        return cls(
+            cls._slim(published_metadata.file),
+            '"{}"'.format(published_metadata.pk),
+            published_metadata._created,
+            tuple(
+                (c.encoding, cls(cls._slim(c.file), '"{}"'.format(c.pk), c._created))
+                for c in compressed
+            )
+        )
+
+
 class Handler:
     """
     A default Handler for the Content App that also can be subclassed to create custom handlers.
@@ -82,19 +169,46 @@ class Handler:
 
     distribution_model = None
 
+    def __init__(self):
+        self.file_responder = get_file_responder()
+
+    @cached_property
+    def file_responder(self):
+        """
+        The :class:`~pulpcore.content.responders.FileResponder` stored files are served with.
+
+        It is created by :meth:`__init__`, or on first use for subclasses not calling it.
+        """
+        return get_file_responder()
+
     async def stream_content(self, request):
         """
         The request handler for the Content app.
 
+        Requests are limited per client address by ``CONTENT_APP_LIMITS['client']``, see
+        :mod:`pulpcore.content.limits`.
+
         Args:
             request (:class:`aiohttp.web.request`): The request from the client.
 
+        Raises:
+            :class:`aiohttp.web_exceptions.HTTPTooManyRequests`: When over a limit.
+
         Returns:
             :class:`aiohttp.web.StreamResponse` or :class:`aiohttp.web.FileResponse`: The response
                 back to the client.
         """
         path = request.match_info['path']
-        return await self._match_and_stream(path, request)
+        try:
+            async with client_limiter.limit(request.remote):
+                return await self._match_and_stream(path, request)
+        except RateLimited as exc:
+            rate_limited.inc(exc.limit)
+            log.debug(_('Path: %(p)s rate limited for client: %(c)s'),
+                      {'p': path, 'c': request.remote})
+            raise HTTPTooManyRequests(headers={
+                'Retry-After': str(max(1, math.ceil(exc.retry_after)))
+            })
 
     @staticmethod
     def _base_paths(path):
@@ -122,6 +236,9 @@ class Handler:
         """
         Match a distribution using a list of base paths and return its detail object.
 
+        Distributions are matched against an in-process cache, see
+        :class:`~pulpcore.content.cache.DistributionCache`.
+
         Args:
             path (str): The path component of the URL.
 
@@ -131,19 +248,14 @@ class Handler:
         Raises:
             PathNotResolved: when not matched.
         """
-        base_paths = cls._base_paths(path)
-        try:
-            if cls.distribution_model is None:
-                model_class = BaseDistribution
-                return BaseDistribution.objects.get(base_path__in=base_paths).cast()
-            else:
-                model_class = cls.distribution_model
-                return cls.distribution_model.objects.get(base_path__in=base_paths)
-        except ObjectDoesNotExist:
+        model_class = cls.distribution_model or BaseDistribution
+        distribution = distribution_cache.match(path, model_class)
+        if distribution is None:
             log.debug(_('{model_name} not matched for {path} using: {base_paths}').format(
-                model_name=model_class.__name__, path=path, base_paths=base_paths
+                model_name=model_class.__name__, path=path, base_paths=cls._base_paths(path)
             ))
             raise PathNotResolved(path)
+        return distribution
 
     @staticmethod
     def _permit(request, distribution):
@@ -151,6 +263,8 @@ class Handler:
         Permit the request.
 
         Authorization is delegated to the optional content-guard associated with the distribution.
+        The decision is cached when the guard returns a key from `get_permit_cache_key()`, see
+        :class:`~pulpcore.content.cache.PermitCache`.
 
         Args:
             request (:class:`aiohttp.web.Request`): A request for a published file.
@@ -163,8 +277,21 @@ class Handler:
         guard = distribution.content_guard
         if not guard:
             return
+        guard = guard.cast()
+        key = guard.get_permit_cache_key(request)
+        cached = permit_cache.get(guard, key) if key is not None else None
         try:
-            guard.cast().permit(request)
+            if cached is None:
+                try:
+                    guard.permit(request)
+                except PermissionError as pe:
+                    if key is not None:
+                        permit_cache.set(guard, key, False, str(pe))
+                    raise
+                if key is not None:
+                    permit_cache.set(guard, key, True)
+            elif not cached[0]:
+                raise PermissionError(cached[1])
         except PermissionError as pe:
             log.debug(
                 _('Path: %(p)s not permitted by guard: "%(g)s" reason: %(r)s'),
@@ -179,6 +306,11 @@ class Handler:
         """
         Match the path and stream results either from the filesystem or by downloading new data.
 
+        Database access is run in the executor of :mod:`pulpcore.content.db` so that a slow query
+        does not stall other requests served by the event loop. Requests of a distribution are
+        limited by ``CONTENT_APP_LIMITS['distribution']``. The time spent in each stage is
+        observed by :data:`~pulpcore.content.metrics.stage_seconds`.
+
         Args:
             path (str): The path component of the URL.
             request(:class:`~aiohttp.web.Request`): The request to prepare a response for.
@@ -186,75 +318,105 @@ class Handler:
         Raises:
             PathNotResolved: The path could not be matched to a published file.
             PermissionError: When not permitted.
+            :class:`~pulpcore.content.limits.RateLimited`: When over a limit.
 
         Returns:
             :class:`aiohttp.web.StreamResponse` or :class:`aiohttp.web.FileResponse`: The response
                 streamed back to the client.
         """
-        distro = self._match_distribution(path)
-        self._permit(request, distro)
+        with stage_seconds.time('distribution'):
+            distro = await run_sync(self._match_distribution, path)
+        with stage_seconds.time('guard'):
+            await run_sync(self._permit, request, distro)
 
         rel_path = path.lstrip('/')
         rel_path = rel_path[len(distro.base_path):]
         rel_path = rel_path.lstrip('/')
 
-        publication = getattr(distro, 'publication', None)
+        async with distribution_limiter.limit(distro.pk):
+            match = await run_sync(self._match_path, distro, rel_path)
 
-        if publication:
-            # published artifact
-            try:
-                pa = publication.published_artifact.get(relative_path=rel_path)
-                ca = pa.content_artifact
-            except ObjectDoesNotExist:
-                pass
-            else:
-                if ca.artifact:
-                    return self._handle_file_response(ca.artifact.file)
-                else:
-                    return await self._stream_content_artifact(request, StreamResponse(), ca)
+            if isinstance(match, ServedFile):
+                with stage_seconds.time('send'):
+                    return await self._serve_file(request, match)
+            elif isinstance(match, ContentArtifact):
+                with stage_seconds.time('stream'):
+                    return await self._stream_content_artifact(request, StreamResponse(), match)
+            elif isinstance(match, RemoteArtifact):
+                with stage_seconds.time('stream'):
+                    return await self._stream_remote_artifact(request, StreamResponse(), match)
 
-            # published metadata
-            try:
-                pm = publication.published_metadata.get(relative_path=rel_path)
-            except ObjectDoesNotExist:
-                pass
-            else:
-                return self._handle_file_response(pm.file)
+        raise PathNotResolved(path)
 
-            # pass-through
-            if publication.pass_through:
-                try:
-                    ca = ContentArtifact.objects.get(
-                        content__in=publication.repository_version.content,
-                        relative_path=rel_path)
-                except MultipleObjectsReturned:
-                    log.error(
-                        _('Multiple (pass-through) matches for {b}/{p}'),
-                        {
-                            'b': distro.base_path,
-                            'p': rel_path,
-                        }
-                    )
-                    raise
-                except ObjectDoesNotExist:
-                    pass
-                else:
-                    if ca.artifact:
-                        return self._handle_file_response(ca.artifact.file)
-                    else:
-                        return await self._stream_content_artifact(request, StreamResponse(), ca)
+    @staticmethod
+    def _served(content_artifact):
+        """
+        Returns:
+            The :class:`ServedFile` of the artifact of the content artifact, or the content
+            artifact itself when its artifact was not downloaded yet.
+        """
+        if content_artifact.artifact:
+            return ServedFile.for_artifact(content_artifact.artifact)
+        return content_artifact
+
+    def _match_path(self, distro, rel_path):
+        """
+        Find what the distribution serves at a relative path.
 
+        This accesses the database and must not be called from the event loop. Lookups in
+        complete publications are cached, see :class:`~pulpcore.content.cache.PublishedPathCache`.
+
+        Args:
+            distro (detail of :class:`pulpcore.plugin.models.BaseDistribution`): The matched
+                distribution.
+            rel_path (str): The path relative to the base path of the distribution.
+
+        Returns:
+            The :class:`ServedFile` to serve. The :class:`~pulpcore.plugin.models.ContentArtifact`
+            to stream when its artifact was not downloaded yet, or an unsaved
+            :class:`~pulpcore.plugin.models.RemoteArtifact` when the content needs to be fetched
+            from the remote of the distribution. None when nothing matched.
+        """
+        started = time.monotonic()
+        kind, match = self._lookup_path(distro, rel_path)
+        lookup_seconds.observe(time.monotonic() - started, kind)
+        return match
+
+    def _lookup_path(self, distro, rel_path):
+        """
+        Find what the distribution serves at a relative path, see :meth:`_match_path`.
+
+        Returns:
+            tuple: How the path was found, for :data:`~pulpcore.content.metrics.lookup_seconds`,
+                and what is served at the path.
+        """
+        publication = getattr(distro, 'publication', None)
         repo_version = getattr(distro, 'repository_version', None)
         repository = getattr(distro, 'repository', None)
+        if repository:
+            repo_version = latest_version_cache.get(repository)
 
-        if repository or repo_version:
-            if repository:
-                repo_version = RepositoryVersion.latest(distro.repository)
+        missing_key = self._missing_path_key(distro, publication, repo_version, rel_path)
+        if missing_key and missing_path_cache.get(missing_key):
+            return 'missing', None
 
+        if publication:
+            kind = 'publication_cached'
+            match = published_path_cache.get(publication, rel_path)
+            if match is None:
+                kind = 'publication'
+                match = self._match_publication_path(distro, publication, rel_path)
+                if match is None:
+                    published_path_cache.set(publication, rel_path, NOT_FOUND)
+                elif isinstance(match, ServedFile):
+                    published_path_cache.set(publication, rel_path, match)
+            if match is not NOT_FOUND:
+                return kind, match
+
+        if repo_version:
             try:
-                ca = ContentArtifact.objects.get(
-                    content__in=repo_version.content,
-                    relative_path=rel_path)
+                return 'repository_version', \
+                    self._served(repo_version.get_content_artifact(rel_path))
             except MultipleObjectsReturned:
                 log.error(
                     _('Multiple (pass-through) matches for {b}/{p}'),
@@ -266,25 +428,77 @@ class Handler:
                 raise
             except ObjectDoesNotExist:
                 pass
-            else:
-                return self._handle_file_response(ca.artifact.file)
 
         if distro.remote:
             remote = distro.remote.cast()
+            url = remote.get_remote_artifact_url(rel_path)
             try:
-                url = remote.get_remote_artifact_url(rel_path)
-                ra = RemoteArtifact.objects.get(remote=remote, url=url)
-                ca = ra.content_artifact
-                if ca.artifact:
-                    return self._handle_file_response(ca.artifact.file)
-                else:
-                    return await self._stream_content_artifact(request, StreamResponse(), ca)
+                ra = RemoteArtifact.objects.select_related(
+                    'content_artifact__artifact'
+                ).get(remote=remote, url=url)
             except ObjectDoesNotExist:
                 ca = ContentArtifact(relative_path=rel_path)
-                ra = RemoteArtifact(remote=remote, url=url, content_artifact=ca)
-                return await self._stream_remote_artifact(request, StreamResponse(), ra)
+                return 'remote', RemoteArtifact(remote=remote, url=url, content_artifact=ca)
+            else:
+                return 'remote', self._served(ra.content_artifact)
 
-        raise PathNotResolved(path)
+        if missing_key:
+            missing_path_cache.add(missing_key)
+        return 'not_found', None
+
+    @staticmethod
+    def _missing_path_key(distro, publication, repo_version, rel_path):
+        """
+        Get the key a path not served by a distribution is remembered with.
+
+        The key includes what the distribution serves, so the path is looked up again once the
+        distribution serves another publication or repository version.
+
+        Returns:
+            tuple: The key, or None when a miss can't be remembered because what is served might
+                still change, or because the distribution has a remote that can serve any path.
+        """
+        if distro.remote_id or (publication and not publication.complete) or \
+                (repo_version and not repo_version.complete):
+            return None
+        return (
+            distro.pk,
+            publication.pk if publication else None,
+            repo_version.pk if repo_version else None,
+            rel_path,
+        )
+
+    def _match_publication_path(self, distro, publication, rel_path):
+        """
+        Find what a publication serves at a relative path.
+
+        The path is looked up in the :class:`~pulpcore.plugin.models.PublishedPath` index built
+        when the publication was completed, which covers published artifacts, published metadata
+        and pass-through content artifacts.
+
+        This accesses the database and must not be called from the event loop.
+
+        Args:
+            distro (detail of :class:`pulpcore.plugin.models.BaseDistribution`): The matched
+                distribution.
+            publication (:class:`pulpcore.plugin.models.Publication`): The served publication.
+            rel_path (str): The path relative to the base path of the distribution.
+
+        Returns:
+            The :class:`ServedFile` to serve, the :class:`~pulpcore.plugin.models.ContentArtifact`
+            to stream when its artifact was not downloaded yet, or None when nothing matched.
+        """
+        try:
+            published_path = publication.published_paths.select_related(
+                'content_artifact__artifact', 'published_metadata'
+            ).prefetch_related(
+                'published_metadata__compressed_metadata'
+            ).get(relative_path=rel_path)
+        except ObjectDoesNotExist:
+            return None
+        if published_path.published_metadata:
+            return ServedFile.for_published_metadata(published_path.published_metadata)
+        return self._served(published_path.content_artifact)
 
     async def _stream_content_artifact(self, request, response, content_artifact):
         """
@@ -307,15 +521,53 @@ class Handler:
                 :class:`~pulpcore.plugin.models.RemoteArtifact` objects associated with the
                 :class:`~pulpcore.plugin.models.ContentArtifact` returned the binary data needed for
                 the client.
+            :class:`~pulpcore.content.limits.RateLimited`: When the remotes not failing are over
+                their limits.
         """
-        for remote_artifact in content_artifact.remoteartifact_set.all():
-            try:
-                response = await self._stream_remote_artifact(request, response, remote_artifact)
-
-            except ClientResponseError:
-                continue
+        remote_artifacts = await run_sync(
+            list, content_artifact.remoteartifact_set.select_related('remote')
+        )
+        remote_artifacts = remote_stats.sort(remote_artifacts)
+        for remote_artifact in remote_artifacts:
+            etag = self._remote_artifact_etag(remote_artifact)
+            if etag:
+                if self._not_modified(request, etag):
+                    return Response(status=304, headers={'ETag': etag})
+                break
 
-        raise HTTPNotFound()
+        # Downloads started and waiting for headers, keyed by their headers future
+        pending = {}
+        start_next = True
+        limited = None
+        try:
+            while True:
+                if start_next and remote_artifacts:
+                    remote_artifact = remote_artifacts.pop(0)
+                    download, subscription = self._join_download(remote_artifact)
+                    pending[download.headers] = (remote_artifact, download, subscription)
+                if not pending:
+                    raise limited or HTTPNotFound()
+
+                hedge_delay = settings.CONTENT_APP_HEDGE_DELAY if remote_artifacts else None
+                done, waiting = await asyncio.wait(list(pending), timeout=hedge_delay,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                # Start the next remote when this one is too slow or failed
+                start_next = hedge_delay is not None
+                for headers in done:
+                    remote_artifact, download, subscription = pending.pop(headers)
+                    exc = headers.exception()
+                    if exc is None:
+                        return await self._stream_download(request, response, remote_artifact,
+                                                           download, subscription)
+                    download.unsubscribe(subscription)
+                    if isinstance(exc, RateLimited):
+                        limited = exc
+                    elif not isinstance(exc, ClientResponseError):
+                        raise exc
+                    start_next = True
+        finally:
+            for remote_artifact, download, subscription in pending.values():
+                download.abandon(subscription)
 
     def _save_artifact(self, download_result, remote_artifact):
         """
@@ -384,12 +636,105 @@ class Handler:
                 content_artifact.save()
         return artifact
 
+    @staticmethod
+    def _not_modified(request, etag, last_modified=None):
+        """
+        Check the conditional headers of a request against the validators of a file.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request for the file.
+            etag (str): The strong entity tag of the file.
+            last_modified (datetime.datetime): When the file was stored, if known.
+
+        Returns:
+            bool: True when the copy of the client is current and a 304 can be returned.
+        """
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            etags = {tag.strip() for tag in if_none_match.split(',')}
+            return bool({'*', etag, 'W/' + etag} & etags)
+        if last_modified is not None and request.if_modified_since is not None:
+            return last_modified.replace(microsecond=0) <= request.if_modified_since
+        return False
+
+    async def _serve_file(self, request, served_file):
+        """
+        Respond with a stored file, or with 304 when the client already has it.
+
+        The conditional headers are evaluated against the validators known from the database, so
+        revalidation does not touch the storage. Range requests are handled by
+        :meth:`_respond_with_file`.
+
+        Files with compressed copies are served with ``Vary: Accept-Encoding``, and the copy
+        preferred by the ``Accept-Encoding`` of the request is sent with its ``Content-Encoding``
+        when the file responder passes headers on to the client.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request for the file.
+            served_file (:class:`ServedFile`): The file to serve.
+
+        Returns:
+            The :class:`aiohttp.web.StreamResponse` the file was sent with, or a 304
+            :class:`aiohttp.web.Response`.
+        """
+        # Subclasses overriding the synchronous method of earlier releases keep serving with it
+        legacy = type(self)._handle_file_response is not Handler._handle_file_response
+        headers = {}
+        if served_file.variants:
+            headers['Vary'] = 'Accept-Encoding'
+            encoding = None
+            if self.file_responder.sends_headers and not legacy:
+                encoding = self._accepted_encoding(request, [e for e, v in served_file.variants])
+            if encoding:
+                headers['Content-Type'] = \
+                    mimetypes.guess_type(served_file.file.name)[0] or 'application/octet-stream'
+                headers['Content-Encoding'] = encoding
+                served_file = dict(served_file.variants)[encoding]
+        headers['ETag'] = served_file.etag
+        if served_file.last_modified is not None:
+            headers['Last-Modified'] = http_date(served_file.last_modified.timestamp())
+        if self._not_modified(request, served_file.etag, served_file.last_modified):
+            return Response(status=304, headers=headers)
+        if legacy:
+            return self._handle_file_response(served_file.file)
+        return await self._respond_with_file(request, served_file.file, headers)
+
+    @staticmethod
+    def _accepted_encoding(request, encodings):
+        """
+        Choose the content coding to respond with.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request.
+            encodings (list): The available content codings, most preferred first.
+
+        Returns:
+            str: The encoding of `encodings` with the highest quality value in the
+                ``Accept-Encoding`` of the request, or None when none is acceptable.
+        """
+        accepted = {}
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            coding, sep, params = item.partition(';')
+            quality = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                with suppress(ValueError):
+                    quality = float(params[2:])
+            accepted[coding.strip().lower()] = quality
+        chosen, chosen_quality = None, 0
+        for encoding in encodings:
+            quality = accepted.get(encoding, accepted.get('*', 0))
+            if quality > chosen_quality:
+                chosen, chosen_quality = encoding, quality
+        return chosen
+
     def _handle_file_response(self, file):
         """
         Handle response for file.
 
-        Depending on where the file storage (e.g. filesystem, S3, etc) this could be responding with
-        the file (filesystem) or a redirect (S3).
+        Kept for plugins of earlier releases, the Content App serves files with
+        :meth:`_respond_with_file`. Subclasses overriding this method are still served with it,
+        without Range requests and compressed copies of published metadata.
 
         Args:
             file (:class:`django.db.models.fields.files.FieldFile`): File to respond with
@@ -408,10 +753,33 @@ class Handler:
         else:
             raise NotImplementedError()
 
+    async def _respond_with_file(self, request, file, headers):
+        """
+        Respond with a stored file.
+
+        Depending on the file storage (e.g. filesystem, S3, etc) this could be responding with the
+        file (filesystem) or a redirect (S3), see :mod:`pulpcore.content.responders`.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request for the file.
+            file (:class:`django.db.models.fields.files.FieldFile`): File to respond with
+            headers (dict): Headers to add to the response.
+
+        Raises:
+            :class:`aiohttp.web_exceptions.HTTPFound`: When we need to redirect to the file
+
+        Returns:
+            The :class:`aiohttp.web.StreamResponse` the file was sent with.
+        """
+        return await self.file_responder.respond(request, file, headers)
+
     async def _stream_remote_artifact(self, request, response, remote_artifact):
         """
         Stream and save a RemoteArtifact.
 
+        Concurrent requests for the same RemoteArtifact share a single download from the remote,
+        see :class:`~pulpcore.content.downloads.SharedDownload`.
+
         Args:
             request(:class:`~aiohttp.web.Request`): The request to prepare a response for.
             response (:class:`~aiohttp.web.StreamResponse`): The response to stream data to.
@@ -425,32 +793,180 @@ class Handler:
                 the client.
 
         """
-        remote = remote_artifact.remote.cast()
+        etag = self._remote_artifact_etag(remote_artifact)
+        if etag and self._not_modified(request, etag):
+            return Response(status=304, headers={'ETag': etag})
 
-        async def handle_headers(headers):
+        download, subscription = self._join_download(remote_artifact)
+        return await self._stream_download(request, response, remote_artifact, download,
+                                           subscription)
+
+    @staticmethod
+    def _remote_artifact_etag(remote_artifact):
+        """
+        Returns:
+            str: The ETag of the RemoteArtifact, from its sha256 when known.
+        """
+        return '"{}"'.format(remote_artifact.sha256) if remote_artifact.sha256 else None
+
+    def _join_download(self, remote_artifact):
+        """
+        Subscribe to the download of a RemoteArtifact, starting it unless it is in progress.
+
+        Args:
+            remote_artifact (:class:`~pulpcore.plugin.models.RemoteArtifact`): The RemoteArtifact
+                to download.
+
+        Returns:
+            tuple: The :class:`~pulpcore.content.downloads.SharedDownload` and the
+                :class:`~pulpcore.content.downloads.Subscription` to it.
+        """
+        key = (remote_artifact.remote_id, remote_artifact.url)
+        download = shared_downloads.get(key)
+        subscription = download.subscribe() if download else None
+        if subscription is None:
+            download = SharedDownload(settings.CONTENT_APP_SHARED_DOWNLOAD_BUFFER)
+            subscription = download.subscribe()
+            shared_downloads[key] = download
+            download.task = asyncio.ensure_future(
+                self._download_remote_artifact(download, key, remote_artifact)
+            )
+        return download, subscription
+
+    async def _stream_download(self, request, response, remote_artifact, download,
+                               subscription):
+        """
+        Stream the data of a download to the client.
+
+        Args:
+            request(:class:`~aiohttp.web.Request`): The request to prepare a response for.
+            response (:class:`~aiohttp.web.StreamResponse`): The response to stream data to.
+            remote_artifact (:class:`~pulpcore.plugin.models.RemoteArtifact`): The downloaded
+                RemoteArtifact.
+            download (:class:`~pulpcore.content.downloads.SharedDownload`): The download.
+            subscription (:class:`~pulpcore.content.downloads.Subscription`): The subscription
+                of the request to the download.
+
+        Raises:
+            :class:`aiohttp.client_exceptions.ClientResponseError`: When the download failed
+                before the response was prepared.
+
+        Returns:
+            :class:`aiohttp.web.StreamResponse`: The response.
+        """
+        etag = self._remote_artifact_etag(remote_artifact)
+        try:
+            headers = await download.headers
+            byte_range = None
             for name, value in headers.items():
                 if name.lower() in self.hop_by_hop_headers:
                     continue
                 response.headers[name] = value
+            if etag:
+                response.headers['ETag'] = etag
+            size = remote_artifact.size or headers.get('Content-Length')
+            if size and 'Content-Encoding' not in headers:
+                response.headers['Accept-Ranges'] = 'bytes'
+                requested_range = None
+                if 'Range' in request.headers:
+                    with suppress(ValueError):
+                        requested_range = request.http_range
+                if requested_range:
+                    start, stop, step = requested_range.indices(int(size))
+                    if start < stop:
+                        # The whole file is still downloaded, only the range is sent
+                        byte_range = (start, stop)
+                        response.set_status(206)
+                        response.headers['Content-Range'] = 'bytes {}-{}/{}'.format(
+                            start, stop - 1, size
+                        )
+                        response.headers['Content-Length'] = str(stop - start)
             await response.prepare(request)
 
+            position = 0
+            while True:
+                data = await subscription.read()
+                if not data:
+                    break
+                if byte_range:
+                    start, stop = byte_range
+                    chunk = data[max(start - position, 0):max(stop - position, 0)]
+                    position += len(data)
+                    if chunk:
+                        await response.write(chunk)
+                else:
+                    await response.write(data)
+        finally:
+            download.unsubscribe(subscription)
+        await response.write_eof()
+        return response
+
+    async def _download_remote_artifact(self, download, key, remote_artifact):
+        """
+        Download a RemoteArtifact once for every request subscribed to it and queue its save.
+
+        The download runs independently of the requests, so it completes and the Artifact is
+        saved even if the client that started it goes away. The save is run in the background by
+        :data:`~pulpcore.content.persistence.artifact_saver`. The remote is taken from
+        :data:`~pulpcore.content.downloads.remote_pool` so its connections are reused. Downloads
+        from a remote are limited by ``CONTENT_APP_LIMITS['remote']``.
+
+        Args:
+            download (:class:`~pulpcore.content.downloads.SharedDownload`): The download to publish
+                the headers and data to.
+            key (tuple): The key of the download in `shared_downloads`.
+            remote_artifact (:class:`~pulpcore.plugin.models.RemoteArtifact`): The RemoteArtifact
+                to download.
+        """
+        started = time.monotonic()
+
+        async def handle_headers(headers):
+            remote_stats.record(remote_artifact.remote_id, time.monotonic() - started)
+            download.publish_headers(headers)
+
         async def handle_data(data):
-            await response.write(data)
+            download.publish(data)
             if remote.policy != Remote.STREAMED:
                 await original_handle_data(data)
 
         async def finalize():
             if remote.policy != Remote.STREAMED:
                 await original_finalize()
-        downloader = remote.get_downloader(remote_artifact=remote_artifact,
-                                           headers_ready_callback=handle_headers)
-        original_handle_data = downloader.handle_data
-        downloader.handle_data = handle_data
-        original_finalize = downloader.finalize
-        downloader.finalize = finalize
-        download_result = await downloader.run()
-
-        if remote.policy != Remote.STREAMED:
-            self._save_artifact(download_result, remote_artifact)
-        await response.write_eof()
-        return response
+
+        pooled = None
+        admitted = False
+        try:
+            await remote_limiter.acquire(remote_artifact.remote_id,
+                                         settings.CONTENT_APP_LIMIT_QUEUE_TIMEOUT)
+            admitted = True
+            # The time queued is not the latency of the remote
+            started = time.monotonic()
+            pooled = await remote_pool.acquire(remote_artifact.remote)
+            remote = pooled.remote
+            downloader = remote.get_downloader(remote_artifact=remote_artifact,
+                                               headers_ready_callback=handle_headers)
+            original_handle_data = downloader.handle_data
+            downloader.handle_data = handle_data
+            original_finalize = downloader.finalize
+            downloader.finalize = finalize
+            with stage_seconds.time('fetch'):
+                download_result = await downloader.run()
+
+            if remote.policy != Remote.STREAMED:
+                # The response ends as soon as the save is queued, not when it is done
+                await artifact_saver.put(stage_seconds.timed(self._save_artifact, 'save'),
+                                         download_result, remote_artifact)
+        except Exception as exc:
+            if not download.headers.done() and not isinstance(exc, RateLimited):
+                remote_stats.record(remote_artifact.remote_id, time.monotonic() - started,
+                                    failed=True)
+            download.finish(exc)
+        else:
+            download.finish()
+        finally:
+            if shared_downloads.get(key) is download:
+                del shared_downloads[key]
+            if pooled is not None:
+                await remote_pool.release(pooled)
+            if admitted:
+                remote_limiter.release(remote_artifact.remote_id)
@@ -0,0 +1,201 @@
+import asyncio
+from collections import defaultdict, deque
+import time
+
+from django.conf import settings
+
+from .cache import LRUCache
+
+
+class RateLimited(Exception):
+    """
+    A request is over a limit and could not be queued within the queue timeout.
+
+    Attributes:
+        retry_after (float): The seconds after which the request is expected to succeed.
+        limit (str): The name of the limiter the request is over.
+    """
+
+    def __init__(self, retry_after, limit=None):
+        super().__init__(retry_after, limit)
+        self.retry_after = retry_after
+        self.limit = limit
+
+
+class TokenBucket:
+    """
+    Allows `rate` requests per second on average, with bursts of up to `burst` requests.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def reserve(self, now):
+        """
+        Take a token, ahead of time when none is left.
+
+        Args:
+            now (float): The current :func:`time.monotonic`.
+
+        Returns:
+            float: The seconds to wait for the token, 0 when it was available.
+        """
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0, -self.tokens / self.rate)
+
+    def cancel(self):
+        """
+        Give back a token taken with `reserve()`.
+        """
+        self.tokens += 1
+
+
+class Limiter:
+    """
+    Token-bucket rate limits and caps of the requests in flight, per key.
+
+    Requests over a limit wait for up to the queue timeout, and raise :class:`RateLimited`
+    when they would have to wait longer. A limiter without `rate` nor `max_in_flight` lets
+    everything through.
+    """
+
+    def __init__(self, rate=None, burst=None, max_in_flight=None, max_keys=10000, name=None):
+        """
+        Args:
+            rate (float): The requests allowed per second and key, None for no rate limit.
+            burst (int): The requests allowed at once above the rate, defaults to the rate.
+            max_in_flight (int): The requests allowed in progress per key, None for no cap.
+            max_keys (int): The number of keys whose token bucket is remembered.
+            name (str): The name of the limiter, e.g. 'client'.
+        """
+        self.name = name
+        self.rate = rate
+        self.burst = burst or max(rate or 0, 1)
+        self.max_in_flight = max_in_flight
+        self.in_flight = defaultdict(int)
+        self._buckets = LRUCache(max_keys)
+        self._waiters = defaultdict(deque)
+
+    @classmethod
+    def from_settings(cls, name):
+        """
+        Args:
+            name (str): The kind of key limited, 'client', 'distribution' or 'remote'.
+
+        Returns:
+            :class:`Limiter`: A limiter configured with ``CONTENT_APP_LIMITS[name]``.
+        """
+        return cls(name=name, **settings.CONTENT_APP_LIMITS.get(name, {}))
+
+    def limit(self, key, timeout=None):
+        """
+        Limit a request while in the returned asynchronous context manager.
+
+        Args:
+            key: The key the request is limited by, e.g. the client address.
+            timeout (float): The seconds a request may be queued for, defaults to
+                ``CONTENT_APP_LIMIT_QUEUE_TIMEOUT``.
+
+        Returns:
+            An asynchronous context manager raising :class:`RateLimited` on entry when the
+            request is over a limit.
+        """
+        if timeout is None:
+            timeout = settings.CONTENT_APP_LIMIT_QUEUE_TIMEOUT
+        return _Limit(self, key, timeout)
+
+    async def acquire(self, key, timeout):
+        """
+        Wait for the request to be within the limits of a key.
+
+        Requests acquired must be released with `release()`.
+
+        Args:
+            key: The key the request is limited by.
+            timeout (float): The seconds the request may wait for.
+
+        Raises:
+            RateLimited: When the request would have to wait for more than `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        if self.rate:
+            await self._take_token(key, timeout)
+        if self.max_in_flight:
+            await self._take_slot(key, deadline)
+        self.in_flight[key] += 1
+
+    def release(self, key):
+        """
+        Release a request acquired with `acquire()`, letting the next queued one in.
+
+        Args:
+            key: The key the request is limited by.
+        """
+        self.in_flight[key] -= 1
+        if not self.in_flight[key]:
+            del self.in_flight[key]
+        self._wake_next(key)
+
+    def _wake_next(self, key):
+        waiters = self._waiters.get(key)
+        while waiters:
+            waiter = waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                break
+        if key in self._waiters and not self._waiters[key]:
+            del self._waiters[key]
+
+    async def _take_token(self, key, timeout):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst)
+            self._buckets.set(key, bucket)
+        wait = bucket.reserve(time.monotonic())
+        if wait > timeout:
+            bucket.cancel()
+            raise RateLimited(wait, self.name)
+        if wait:
+            await asyncio.sleep(wait)
+
+    async def _take_slot(self, key, deadline):
+        while self.in_flight[key] >= self.max_in_flight:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # Requests in flight give no hint of when they end
+                raise RateLimited(1, self.name)
+            waiter = asyncio.get_event_loop().create_future()
+            self._waiters[key].append(waiter)
+            try:
+                await asyncio.wait_for(waiter, remaining)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Pass the released slot on to the next request in the queue
+                    self._wake_next(key)
+                raise
+
+
+class _Limit:
+
+    def __init__(self, limiter, key, timeout):
+        self.limiter = limiter
+        self.key = key
+        self.timeout = timeout
+
+    async def __aenter__(self):
+        await self.limiter.acquire(self.key, self.timeout)
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.release(self.key)
+
+
+client_limiter = Limiter.from_settings('client')
+distribution_limiter = Limiter.from_settings('distribution')
+remote_limiter = Limiter.from_settings('remote')
@@ -0,0 +1,190 @@
+import asyncio
+from collections import OrderedDict
+from contextlib import suppress
+from gettext import gettext as _
+import hashlib
+import logging
+import os
+import tempfile
+
+
+log = logging.getLogger(__name__)
+
+
+class LocalFileCache:
+    """
+    A least recently used cache of the files of the storage on the local disk.
+
+    Files are kept by a sha256 digest, the one of their content for artifacts, which is verified
+    when they are fetched, and the one of their storage name for other files. Concurrent requests
+    for a file fetch it once.
+
+    Files are evicted when the cache is over `max_size` bytes. Processes sharing the directory
+    each account for the files they fetched or found when they started, and fetch again the files
+    another process evicted.
+    """
+
+    # The size of the chunks copied from the storage.
+    CHUNK_SIZE = 1024 * 1024
+
+    # The prefix of the files being fetched.
+    TEMP_PREFIX = '.fetching-'
+
+    def __init__(self, path, max_size):
+        """
+        Args:
+            path (str): The directory the files are cached in.
+            max_size (int): The maximum size in bytes of the cached files.
+        """
+        self.path = path
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._files = OrderedDict()
+        self._fetches = {}
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of lookups that hit and missed, and the files and bytes cached.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._files),
+            'memory': self.size,
+        }
+
+    def load(self):
+        """
+        Account for the files already in the cache directory, the least recently accessed first.
+
+        Files left over by interrupted fetches are removed.
+        """
+        found = []
+        for root, dirs, files in os.walk(self.path):
+            for name in files:
+                path = os.path.join(root, name)
+                if name.startswith(self.TEMP_PREFIX):
+                    with suppress(OSError):
+                        os.unlink(path)
+                    continue
+                with suppress(OSError):
+                    stat = os.stat(path)
+                    found.append((stat.st_atime, name, stat.st_size))
+        for atime, key, size in sorted(found):
+            self._add(key, size)
+
+    @staticmethod
+    def key(name):
+        """
+        Args:
+            name (str): The storage name of a file.
+
+        Returns:
+            tuple: The key of the file and whether it is the digest of its content.
+        """
+        parts = name.split('/')
+        if len(parts) >= 3 and parts[-3] == 'artifact' and len(parts[-2]) == 2:
+            digest = parts[-2] + parts[-1]
+            if len(digest) == 64:
+                return digest, True
+        return hashlib.sha256(name.encode()).hexdigest(), False
+
+    def _local_path(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    async def get(self, file):
+        """
+        Get the local copy of a file, fetching it from the storage unless cached.
+
+        Args:
+            file (:class:`django.db.models.fields.files.FieldFile`): A file of the storage.
+
+        Raises:
+            ValueError: When the content of an artifact does not match its digest.
+
+        Returns:
+            str: The path of the local copy.
+        """
+        key, verify = self.key(file.name)
+        if key in self._files:
+            self._files.move_to_end(key)
+            self.hits += 1
+            return self._local_path(key)
+        self.misses += 1
+        fetch = self._fetches.get(key)
+        if fetch is None:
+            fetch = self._fetches[key] = asyncio.ensure_future(self._fetch(key, verify, file))
+            fetch.add_done_callback(lambda f: self._fetches.pop(key, None))
+        # A client going away does not interrupt the fetch other clients wait for
+        return await asyncio.shield(fetch)
+
+    def discard(self, file):
+        """
+        Forget a file, e.g. after another process evicted it.
+
+        Args:
+            file (:class:`django.db.models.fields.files.FieldFile`): A file of the storage.
+        """
+        key, verify = self.key(file.name)
+        size = self._files.pop(key, None)
+        if size is not None:
+            self.size -= size
+
+    async def _fetch(self, key, verify, file):
+        loop = asyncio.get_event_loop()
+        path = self._local_path(key)
+        size = await loop.run_in_executor(None, self._copy, file, path, key if verify else None)
+        evicted = self._add(key, size)
+        if evicted:
+            await loop.run_in_executor(None, self._remove, evicted)
+        return path
+
+    def _add(self, key, size):
+        self._files[key] = size
+        self.size += size
+        evicted = []
+        # The file just added is kept even when larger than the cache, it is about to be served
+        while self.size > self.max_size and len(self._files) > 1:
+            old_key, old_size = self._files.popitem(last=False)
+            self.size -= old_size
+            evicted.append(self._local_path(old_key))
+        return evicted
+
+    def _copy(self, file, path, digest):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=self.TEMP_PREFIX)
+        try:
+            hasher = hashlib.sha256()
+            size = 0
+            with os.fdopen(fd, 'wb') as dst, file.storage.open(file.name, 'rb') as src:
+                for chunk in iter(lambda: src.read(self.CHUNK_SIZE), b''):
+                    dst.write(chunk)
+                    size += len(chunk)
+                    if digest:
+                        hasher.update(chunk)
+            if digest and hasher.hexdigest() != digest:
+                raise ValueError(_("The content of '{name}' does not match its digest").format(
+                    name=file.name
+                ))
+            os.rename(temp_path, path)
+        except BaseException:
+            with suppress(OSError):
+                os.unlink(temp_path)
+            raise
+        return size
+
+    @staticmethod
+    def _remove(paths):
+        for path in paths:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            except OSError as exc:
+                log.warning(_("Failed to remove '{path}' from the local cache: {error}").format(
+                    path=path, error=exc
+                ))
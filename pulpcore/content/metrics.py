@@ -0,0 +1,320 @@
+"""
+Metrics of the Content App, exposed in the Prometheus text format.
+
+Each Content App process has its own metrics, so with ``CONTENT_APP_WORKERS`` above 1 every
+scrape reports the worker that happened to accept the connection.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+import threading
+import time
+
+from aiohttp import web
+from aiohttp.web_exceptions import HTTPException
+from django.conf import settings
+
+from .cache import (
+    latest_version_cache,
+    missing_path_cache,
+    permit_cache,
+    published_path_cache,
+)
+from .downloads import remote_stats, shared_downloads
+from .limits import client_limiter, distribution_limiter, remote_limiter
+from .persistence import artifact_saver
+
+
+#: The upper bounds in seconds of the buckets of histograms.
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        )
+        for name, value in pairs
+    ) + '}'
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """
+    A named metric with values per combination of label values.
+
+    Metrics are updated from both the event loop and the database executor threads.
+    """
+
+    TYPE = None
+
+    def __init__(self, name, documentation, labels=()):
+        """
+        Args:
+            name (str): The name of the metric.
+            documentation (str): What the metric measures.
+            labels (tuple): The names of the labels of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        """
+        Returns:
+            list: The lines of the metric in the Prometheus text format.
+        """
+        lines = [
+            '# HELP {} {}'.format(self.name, self.documentation),
+            '# TYPE {} {}'.format(self.name, self.TYPE),
+        ]
+        for suffix, labels, extra, value in self.samples():
+            lines.append('{}{}{} {}'.format(
+                self.name, suffix, _format_labels(self.labels, labels, extra), _format_value(value)
+            ))
+        return lines
+
+    def samples(self):
+        """
+        Returns:
+            list: Tuples of the name suffix, the label values, extra (name, value) labels and the
+                value of the samples of the metric.
+        """
+        raise NotImplementedError()
+
+
+class Counter(Metric):
+    """
+    A count that only goes up.
+    """
+
+    TYPE = 'counter'
+
+    def inc(self, *labels, amount=1):
+        """
+        Args:
+            labels (tuple): The label values.
+            amount (int): The amount to add.
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [('', labels, (), value) for labels, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    """
+    The distribution of durations, counted in `BUCKETS`.
+    """
+
+    TYPE = 'histogram'
+
+    def observe(self, seconds, *labels):
+        """
+        Args:
+            seconds (float): The observed duration.
+            labels (tuple): The label values.
+        """
+        with self._lock:
+            try:
+                counts, total = self._values[labels]
+            except KeyError:
+                counts, total = [0] * (len(BUCKETS) + 1), 0
+            counts[bisect_left(BUCKETS, seconds)] += 1
+            self._values[labels] = (counts, total + seconds)
+
+    @contextmanager
+    def time(self, *labels):
+        """
+        Observe the time spent in the context, including when it raises.
+
+        Args:
+            labels (tuple): The label values.
+        """
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, *labels)
+
+    def timed(self, func, *labels):
+        """
+        Args:
+            func (callable): A blocking callable.
+            labels (tuple): The label values.
+
+        Returns:
+            callable: The callable observing the time spent in `func`.
+        """
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.time(*labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+    def samples(self):
+        with self._lock:
+            values = sorted((labels, (list(counts), total))
+                            for labels, (counts, total) in self._values.items())
+        samples = []
+        for labels, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                cumulative += count
+                samples.append(('_bucket', labels, (('le', bound),), cumulative))
+            samples.append(('_sum', labels, (), total))
+            samples.append(('_count', labels, (), cumulative))
+        return samples
+
+
+class Collected(Metric):
+    """
+    A metric whose values are collected from the state of the Content App when rendered.
+    """
+
+    def __init__(self, name, documentation, labels, collect, metric_type='gauge'):
+        """
+        Args:
+            name (str): The name of the metric.
+            documentation (str): What the metric measures.
+            labels (tuple): The names of the labels of the metric.
+            collect (callable): Returns a list of (label values, value) tuples.
+            metric_type (str): The Prometheus type of the metric, 'gauge' or 'counter'.
+        """
+        super().__init__(name, documentation, labels)
+        self.TYPE = metric_type
+        self.collect = collect
+
+    def samples(self):
+        return [('', labels, (), value) for labels, value in self.collect()]
+
+
+#: The caches whose hits and misses are reported, by name.
+caches = {
+    'latest_version': latest_version_cache,
+    'missing_path': missing_path_cache,
+    'permit': permit_cache,
+    'published_path': published_path_cache,
+}
+
+#: The limiters whose requests in flight are reported, by name.
+limiters = {
+    'client': client_limiter,
+    'distribution': distribution_limiter,
+    'remote': remote_limiter,
+}
+
+
+def _cache_stat(name):
+    return lambda: [((cache,), c.stats()[name]) for cache, c in sorted(caches.items())]
+
+
+def _cache_hit_ratio():
+    ratios = []
+    for cache, c in sorted(caches.items()):
+        stats = c.stats()
+        lookups = stats['hits'] + stats['misses']
+        ratios.append(((cache,), stats['hits'] / lookups if lookups else 0.0))
+    return ratios
+
+
+request_seconds = Histogram(
+    'pulp_content_request_seconds', 'Time to respond to requests, by status.', ['status']
+)
+stage_seconds = Histogram(
+    'pulp_content_stage_seconds', 'Time spent in the stages of serving requests.', ['stage']
+)
+lookup_seconds = Histogram(
+    'pulp_content_lookup_seconds', 'Time to find what is served at a path, by how it was found.',
+    ['kind']
+)
+rate_limited = Counter(
+    'pulp_content_rate_limited_total', 'Requests rejected for being over a limit.', ['limit']
+)
+
+metrics = [
+    request_seconds,
+    stage_seconds,
+    lookup_seconds,
+    rate_limited,
+    Collected('pulp_content_cache_hits_total', 'Cache lookups that hit.', ['cache'],
+              _cache_stat('hits'), metric_type='counter'),
+    Collected('pulp_content_cache_misses_total', 'Cache lookups that missed.', ['cache'],
+              _cache_stat('misses'), metric_type='counter'),
+    Collected('pulp_content_cache_hit_ratio', 'The ratio of cache lookups that hit.', ['cache'],
+              _cache_hit_ratio),
+    Collected('pulp_content_cache_entries', 'The number of cached entries.', ['cache'],
+              _cache_stat('entries')),
+    Collected('pulp_content_in_flight', 'Requests in progress, by limit.', ['limit'],
+              lambda: [((name,), sum(limiter.in_flight.values()))
+                       for name, limiter in sorted(limiters.items())]),
+    Collected('pulp_content_shared_downloads', 'Downloads from remotes in progress.', [],
+              lambda: [((), len(shared_downloads))]),
+    Collected('pulp_content_remote_latency_seconds',
+              'Moving average of the time remotes take to respond.', ['remote'],
+              lambda: [((str(pk),), stats[0]) for pk, stats in remote_stats.items()]),
+    Collected('pulp_content_remote_error_ratio',
+              'Moving average of the ratio of downloads failing, by remote.', ['remote'],
+              lambda: [((str(pk),), stats[1]) for pk, stats in remote_stats.items()]),
+    Collected('pulp_content_saves_pending', 'Pull-through artifacts waiting to be saved.', [],
+              lambda: [((), artifact_saver.pending)]),
+    Collected('pulp_content_saves_total', 'Pull-through artifact saves, by result.', ['result'],
+              lambda: [(('saved',), artifact_saver.saved), (('failed',), artifact_saver.failed)],
+              metric_type='counter'),
+]
+
+
+def render():
+    """
+    Returns:
+        str: Every metric in the Prometheus text format.
+    """
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+async def metrics_view(request):
+    """
+    The request handler of ``CONTENT_APP_METRICS_PATH``.
+
+    Args:
+        request (:class:`aiohttp.web.Request`): The request from the client.
+
+    Returns:
+        :class:`aiohttp.web.Response`: The metrics in the Prometheus text format.
+    """
+    return web.Response(body=render().encode(), headers={
+        'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'
+    })
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """
+    Observe the time taken to respond to every request but the ones for the metrics.
+    """
+    if request.path == settings.CONTENT_APP_METRICS_PATH:
+        return await handler(request)
+    started = time.monotonic()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except HTTPException as exc:
+        status = exc.status
+        raise
+    finally:
+        request_seconds.observe(time.monotonic() - started, str(status))
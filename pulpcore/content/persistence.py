@@ -0,0 +1,83 @@
+import asyncio
+from gettext import gettext as _
+import logging
+
+from django.conf import settings
+
+from .db import run_sync
+
+
+log = logging.getLogger(__name__)
+
+
+class ArtifactSaver:
+    """
+    A bounded queue of blocking saves run in the background by the Content App.
+
+    Pull-through Artifacts are saved after the response was sent, so clients don't wait on the
+    database. When ``CONTENT_APP_SAVE_QUEUE_SIZE`` saves are already pending, `put()` waits for a
+    free slot, which slows down the downloads finishing instead of piling up downloaded files.
+    """
+
+    def __init__(self):
+        self.pending = 0
+        self.max_pending = 0
+        self.saved = 0
+        self.failed = 0
+        self._queue = None
+
+    def stats(self):
+        """
+        Returns:
+            dict: The number of saves queued or running, the most there ever were, and the number
+                of saves that succeeded and failed.
+        """
+        return {
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            'saved': self.saved,
+            'failed': self.failed,
+        }
+
+    def _start(self):
+        self._queue = asyncio.Queue(maxsize=settings.CONTENT_APP_SAVE_QUEUE_SIZE)
+        for i in range(settings.CONTENT_APP_SAVE_WORKERS):
+            asyncio.ensure_future(self._work())
+
+    async def put(self, func, *args):
+        """
+        Queue a blocking callable to be run in the database executor.
+
+        Args:
+            func (callable): The callable saving the data.
+            args (tuple): Positional arguments for the callable.
+        """
+        if self._queue is None:
+            self._start()
+        await self._queue.put((func, args))
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+
+    async def join(self):
+        """
+        Wait for every queued save to finish.
+        """
+        if self._queue is not None:
+            await self._queue.join()
+
+    async def _work(self):
+        while True:
+            func, args = await self._queue.get()
+            try:
+                await run_sync(func, *args)
+            except Exception:
+                self.failed += 1
+                log.exception(_("Failed to save a pull-through artifact."))
+            else:
+                self.saved += 1
+            finally:
+                self.pending -= 1
+                self._queue.task_done()
+
+
+artifact_saver = ArtifactSaver()
@@ -0,0 +1,199 @@
+import asyncio
+from gettext import gettext as _
+import mimetypes
+import os
+import time
+
+from aiohttp.web import StreamResponse
+from aiohttp.web_exceptions import HTTPFound
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .cache import LRUCache
+from .files import FileSender
+from .local_cache import LocalFileCache
+from .metrics import caches
+
+
+class FileResponder:
+    """
+    Base class of the ways the Content App responds with a file of the storage.
+
+    Subclasses are registered in `responders` and implement `respond()`.
+
+    Attributes:
+        sends_headers (bool): Whether the headers given to `respond()` reach the client. They
+            don't when redirecting, so compressed files are not served through such responders.
+    """
+
+    sends_headers = True
+
+    async def respond(self, request, file, headers):
+        """
+        Respond with a stored file.
+
+        Args:
+            request (:class:`aiohttp.web.Request`): The request for the file.
+            file (:class:`django.db.models.fields.files.FieldFile`): The file to respond with.
+            headers (dict): Headers to add to the response.
+
+        Raises:
+            :class:`aiohttp.web_exceptions.HTTPFound`: When redirecting to the file.
+
+        Returns:
+            :class:`aiohttp.web.StreamResponse`: The response the file was sent with.
+        """
+        raise NotImplementedError()
+
+
+class FileSystemResponder(FileResponder):
+    """
+    Sends files stored below ``MEDIA_ROOT`` with a :class:`~pulpcore.content.files.FileSender`.
+    """
+
+    def __init__(self):
+        self.sender = FileSender.from_settings()
+
+    async def respond(self, request, file, headers):
+        path = os.path.join(settings.MEDIA_ROOT, file.name)
+        return await self.sender.respond(request, path, headers)
+
+
+class RedirectResponder(FileResponder):
+    """
+    Redirects to the URL of the file given by the storage, e.g. an S3 bucket.
+    """
+
+    sends_headers = False
+
+    async def respond(self, request, file, headers):
+        raise HTTPFound(file.url)
+
+
+class PresignedRedirectResponder(RedirectResponder):
+    """
+    Redirects to presigned URLs of the storage, reusing them for half of their validity.
+
+    Signing a URL for every request takes more time than serving the redirect. Clients are given
+    a cached URL only while it stays valid for at least half of ``AWS_QUERYSTRING_EXPIRE``.
+    """
+
+    def __init__(self):
+        self.urls = LRUCache(settings.CONTENT_APP_PRESIGNED_URL_CACHE_SIZE)
+
+    async def respond(self, request, file, headers):
+        now = time.monotonic()
+        cached = self.urls.get(file.name)
+        if cached and cached[1] > now:
+            raise HTTPFound(cached[0])
+        url = file.url
+        expire = getattr(file.storage, 'querystring_expire', None) or 0
+        self.urls.set(file.name, (url, now + expire / 2))
+        raise HTTPFound(url)
+
+
+class ProxyResponder(FileResponder):
+    """
+    Streams the file read from the storage, for storages clients can't be redirected to.
+
+    Range requests are handled like :class:`~pulpcore.content.files.FileSender` does.
+    """
+
+    def __init__(self):
+        self.chunk_size = settings.CONTENT_APP_FILE_CHUNK_SIZE
+
+    async def respond(self, request, file, headers):
+        loop = asyncio.get_event_loop()
+        size = await loop.run_in_executor(None, lambda: file.size)
+        response = StreamResponse(headers=headers)
+        if 'Content-Type' not in response.headers:
+            response.content_type = \
+                mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+        offset, count = FileSender.apply_range(request, response, size)
+        response.content_length = count
+        fobj = await loop.run_in_executor(None, file.storage.open, file.name, 'rb')
+        try:
+            await response.prepare(request)
+            if request.method != 'HEAD' and count:
+                if offset:
+                    await loop.run_in_executor(None, fobj.seek, offset)
+                while count > 0:
+                    chunk = await loop.run_in_executor(
+                        None, fobj.read, min(self.chunk_size, count)
+                    )
+                    if not chunk:
+                        break
+                    count -= len(chunk)
+                    await response.write(chunk)
+            await response.write_eof()
+            return response
+        finally:
+            fobj.close()
+
+
+class LocalCacheResponder(FileResponder):
+    """
+    Sends files of the storage from a :class:`~pulpcore.content.local_cache.LocalFileCache`.
+
+    For storages clients can't be redirected to, popular files are then read from the storage
+    once and sent from the local disk with a :class:`~pulpcore.content.files.FileSender`.
+    """
+
+    def __init__(self):
+        self.cache = LocalFileCache(settings.CONTENT_APP_LOCAL_CACHE_DIR,
+                                    settings.CONTENT_APP_LOCAL_CACHE_SIZE)
+        self.cache.load()
+        self.sender = FileSender.from_settings()
+        caches['local_file'] = self.cache
+
+    async def respond(self, request, file, headers):
+        # The cached files are named by digest, the content type is the one of the stored file
+        headers = dict(headers)
+        headers.setdefault('Content-Type',
+                           mimetypes.guess_type(file.name)[0] or 'application/octet-stream')
+        path = await self.cache.get(file)
+        try:
+            return await self.sender.respond(request, path, headers)
+        except FileNotFoundError:
+            # Evicted by another process sharing the cache directory
+            self.cache.discard(file)
+            path = await self.cache.get(file)
+            return await self.sender.respond(request, path, headers)
+
+
+#: The file responders by name, for ``CONTENT_APP_FILE_RESPONDER``.
+responders = {
+    'filesystem': FileSystemResponder,
+    'redirect': RedirectResponder,
+    'presigned-redirect': PresignedRedirectResponder,
+    'proxy': ProxyResponder,
+    'local-cache': LocalCacheResponder,
+}
+
+#: The responders used by default for a ``DEFAULT_FILE_STORAGE``, others use 'proxy'.
+default_responders = {
+    'pulpcore.app.models.storage.FileSystem': 'filesystem',
+    'storages.backends.s3boto3.S3Boto3Storage': 'presigned-redirect',
+}
+
+
+def get_file_responder():
+    """
+    Create the file responder configured for the storage.
+
+    Raises:
+        ImproperlyConfigured: When ``CONTENT_APP_FILE_RESPONDER`` is not a known responder.
+
+    Returns:
+        :class:`FileResponder`: The responder named by ``CONTENT_APP_FILE_RESPONDER``, or the
+            default one for ``DEFAULT_FILE_STORAGE``.
+    """
+    name = settings.CONTENT_APP_FILE_RESPONDER or \
+        default_responders.get(settings.DEFAULT_FILE_STORAGE, 'proxy')
+    try:
+        responder_class = responders[name]
+    except KeyError:
+        raise ImproperlyConfigured(_("Unknown CONTENT_APP_FILE_RESPONDER '{name}'").format(
+            name=name
+        ))
+    return responder_class()
@@ -0,0 +1,110 @@
+"""
+Compare the throughput of the Content App file serving modes.
+
+Each mode serves the same file from its own server process, which is measured for the CPU time
+it used. Run it with the Pulp settings configured, as for ``pulp-content``::
+
+    python -m pulpcore.tests.benchmarks.file_serving --size 512 --requests 64 --concurrency 8
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+
+import aiohttp
+from aiohttp import web
+
+from pulpcore.content.files import FileSender
+
+
+MODES = {
+    'sendfile': dict(use_sendfile=True),
+    'mmap 256KiB': dict(use_sendfile=False, chunk_size=256 * 1024),
+    'mmap 1MiB': dict(use_sendfile=False, chunk_size=1024 * 1024),
+    'mmap 4MiB': dict(use_sendfile=False, chunk_size=4 * 1024 * 1024),
+}
+
+
+def serve(path, port, sender_kwargs, ready, cpu_times):
+    sender = FileSender(**sender_kwargs)
+
+    async def handler(request):
+        return await sender.respond(request, path)
+
+    async def on_shutdown(app):
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        cpu_times.put(usage.ru_utime + usage.ru_stime)
+
+    app = web.Application()
+    app.router.add_get('/', handler)
+    app.on_shutdown.append(on_shutdown)
+    ready.set()
+    web.run_app(app, host='127.0.0.1', port=port, print=None, access_log=None)
+
+
+async def fetch(url, requests, concurrency):
+    received = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def get(session):
+        nonlocal received
+        async with semaphore:
+            async with session.get(url) as response:
+                async for chunk in response.content.iter_chunked(1024 * 1024):
+                    received += len(chunk)
+
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*(get(session) for i in range(requests)))
+    return received
+
+
+def run(path, port, sender_kwargs, requests, concurrency):
+    ready = multiprocessing.Event()
+    cpu_times = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve,
+                                     args=(path, port, sender_kwargs, ready, cpu_times))
+    server.start()
+    ready.wait()
+    time.sleep(0.5)
+    url = 'http://127.0.0.1:{}/'.format(port)
+    try:
+        start = time.monotonic()
+        received = asyncio.get_event_loop().run_until_complete(
+            fetch(url, requests, concurrency)
+        )
+        elapsed = time.monotonic() - start
+    finally:
+        server.terminate()
+        cpu = cpu_times.get(timeout=10)
+        server.join()
+    return received, elapsed, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--size', type=int, default=512, help='File size in MiB.')
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--port', type=int, default=24817)
+    args = parser.parse_args()
+
+    fd, path = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for i in range(args.size):
+                f.write(os.urandom(1024 * 1024))
+        print('{:<12} {:>10} {:>14}'.format('mode', 'MiB/s', 'MiB/CPU second'))
+        for name, sender_kwargs in MODES.items():
+            received, elapsed, cpu = run(path, args.port, sender_kwargs, args.requests,
+                                         args.concurrency)
+            mib = received / 1024 / 1024
+            print('{:<12} {:>10.0f} {:>14.0f}'.format(name, mib / elapsed, mib / cpu))
+    finally:
+        os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Compare the queries of the content of a repository version.
+
+The benchmark creates a test database with a repository of `--content` units added over
+`--versions` versions, so it needs the Pulp settings configured, as for ``pulp-content``::
+
+    python -m pulpcore.tests.benchmarks.repository_version_content --content 1000000
+"""
+import argparse
+import time
+
+import django
+django.setup()  # noqa otherwise E402: module level not at top of file
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from pulpcore.app.models import (  # noqa: E402
+    Content,
+    Repository,
+    RepositoryContent,
+    RepositoryVersion,
+)
+
+
+def populate(count, versions, batch_size=10000):
+    repository = Repository.objects.create(name='benchmark', last_version=versions)
+    versions = [
+        RepositoryVersion.objects.create(repository=repository, number=number, complete=True)
+        for number in range(1, versions + 1)
+    ]
+    for start in range(0, count, batch_size):
+        contents = Content.objects.bulk_create(
+            [Content(_type='core.content') for i in range(min(batch_size, count - start))]
+        )
+        memberships = []
+        for i, content in enumerate(contents, start):
+            added = versions[i % len(versions)]
+            # Every third unit is removed by the version after the one adding it
+            removed = versions[i % len(versions) + 1] \
+                if i % 3 == 0 and added is not versions[-1] else None
+            memberships.append(RepositoryContent(
+                repository=repository, content=content,
+                version_added=added, number_added=added.number,
+                version_removed=removed, number_removed=removed.number if removed else None,
+            ))
+        RepositoryContent.objects.bulk_create(memberships)
+    return versions
+
+
+def joined(version):
+    relationships = RepositoryContent.objects.filter(
+        repository=version.repository, version_added__number__lte=version.number
+    ).exclude(
+        version_removed__number__lte=version.number
+    )
+    return Content.objects.filter(version_memberships__in=relationships)
+
+
+def numbers(version):
+    return version.content
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--content', type=int, default=1000000)
+    parser.add_argument('--versions', type=int, default=10)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        versions = populate(args.content, args.versions)
+        print('{:<10} {:>14} {:>14}'.format('query', 'count (ms)', 'page (ms)'))
+        for query in (joined, numbers):
+            start = time.monotonic()
+            counts = [query(version).count() for version in versions]
+            counted = time.monotonic() - start
+            start = time.monotonic()
+            for version in versions:
+                list(query(version).order_by('pk')[:100])
+            paged = time.monotonic() - start
+            print('{:<10} {:>14.1f} {:>14.1f}'.format(
+                query.__name__, counted * 1000 / len(versions), paged * 1000 / len(versions)
+            ))
+        assert counts == [joined(version).count() for version in versions]
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
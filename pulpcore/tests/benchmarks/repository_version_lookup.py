@@ -0,0 +1,80 @@
+"""
+Compare the lookups of a ContentArtifact by relative path in a repository version.
+
+The benchmark creates a test database with a repository version of `--content` units, so it
+needs the Pulp settings configured, as for ``pulp-content``::
+
+    python -m pulpcore.tests.benchmarks.repository_version_lookup --content 100000
+"""
+import argparse
+import random
+import time
+
+import django
+django.setup()  # noqa otherwise E402: module level not at top of file
+
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from pulpcore.app.models import (  # noqa: E402
+    Content,
+    ContentArtifact,
+    Repository,
+    RepositoryVersion,
+)
+from pulpcore.app.models.repository import RepositoryContent  # noqa: E402
+
+
+def populate(count, batch_size=10000):
+    repository = Repository.objects.create(name='benchmark')
+    version = RepositoryVersion.objects.create(repository=repository, number=1, complete=True)
+    for start in range(0, count, batch_size):
+        contents = Content.objects.bulk_create(
+            [Content(_type='core.content') for i in range(min(batch_size, count - start))]
+        )
+        ContentArtifact.objects.bulk_create(
+            ContentArtifact(content=content, relative_path='path/{}'.format(start + i))
+            for i, content in enumerate(contents)
+        )
+        RepositoryContent.objects.bulk_create(
+            RepositoryContent(repository=repository, content=content, version_added=version,
+                              number_added=version.number)
+            for content in contents
+        )
+    return version
+
+
+def content_subquery(version, path):
+    return ContentArtifact.objects.select_related('artifact').get(
+        content__in=version.content, relative_path=path
+    )
+
+
+def indexed(version, path):
+    return version.get_content_artifact(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--content', type=int, default=100000)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0)
+    try:
+        version = populate(args.content)
+        paths = ['path/{}'.format(random.randrange(args.content)) for i in range(args.lookups)]
+        print('{:<18} {:>12}'.format('lookup', 'ms/lookup'))
+        for lookup in (content_subquery, indexed):
+            start = time.monotonic()
+            for path in paths:
+                lookup(version, path)
+            elapsed = time.monotonic() - start
+            print('{:<18} {:>12.2f}'.format(lookup.__name__, elapsed * 1000 / len(paths)))
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,225 @@
+from unittest.mock import Mock, patch
+
+from django.test import TestCase, override_settings
+
+from pulpcore.app.models import (
+    BaseDistribution,
+    CacheGeneration,
+    ContentGuard,
+    Publication,
+    PublishedMetadata,
+    Repository,
+    RepositoryVersion,
+)
+from pulpcore.content.cache import (
+    NOT_FOUND,
+    BasePathTrie,
+    DistributionCache,
+    LatestVersionCache,
+    LRUCache,
+    PermitCache,
+    PublishedPathCache,
+)
+from pulpcore.content.handler import ServedFile
+
+
+class LRUCacheTestCase(TestCase):
+
+    def test_max_entries(self):
+        """The least recently used entries are evicted first."""
+        cache = LRUCache(2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.keys(), ['a', 'c'])
+
+    def test_max_memory(self):
+        """Entries are evicted to stay within the memory limit."""
+        cache = LRUCache(10, max_memory=100)
+        cache.set('a', 1, size=60)
+        cache.set('b', 2, size=60)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.get('b'), 2)
+        self.assertEqual(cache.memory, 60)
+
+    def test_disabled(self):
+        """Nothing is cached without entries."""
+        cache = LRUCache(0)
+        cache.set('a', 1)
+        self.assertEqual(len(cache), 0)
+
+    def test_discard(self):
+        """Entries can be dropped by key."""
+        cache = LRUCache(10)
+        cache.set(('a', 1), 1, size=10)
+        cache.set(('b', 1), 2, size=10)
+        cache.discard(lambda key: key[0] == 'a')
+        self.assertEqual(cache.keys(), [('b', 1)])
+        self.assertEqual(cache.memory, 10)
+
+
+class BasePathTrieTestCase(TestCase):
+
+    def setUp(self):
+        self.trie = BasePathTrie()
+        self.trie.insert('foo/bar', 'foobar')
+        self.trie.insert('baz', 'baz')
+
+    def test_match(self):
+        """The distribution whose base path prefixes the path is matched."""
+        self.assertEqual(self.trie.match('foo/bar/file.txt'), 'foobar')
+        self.assertEqual(self.trie.match('/foo/bar/some/dir/file.txt'), 'foobar')
+        self.assertEqual(self.trie.match('baz/file.txt'), 'baz')
+
+    def test_match_root(self):
+        """The root of a distribution is matched with a trailing slash."""
+        self.assertEqual(self.trie.match('foo/bar/'), 'foobar')
+        self.assertEqual(self.trie.match('/baz/'), 'baz')
+        self.assertIsNone(self.trie.match('foo/'))
+        self.assertIsNone(self.trie.match('/'))
+
+    def test_no_match(self):
+        """Paths that are not below a base path are not matched."""
+        self.assertIsNone(self.trie.match('foo/file.txt'))
+        self.assertIsNone(self.trie.match('foo/bar'))
+        self.assertIsNone(self.trie.match('foo/barbaz/file.txt'))
+        self.assertIsNone(self.trie.match('qux/file.txt'))
+
+
+@override_settings(CONTENT_APP_CACHE_REFRESH_INTERVAL=0)
+class DistributionCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = DistributionCache()
+        self.distribution = BaseDistribution.objects.create(name='foo', base_path='foo/bar')
+
+    def test_match(self):
+        """Distributions are matched and then served from memory."""
+        self.assertEqual(self.cache.match('foo/bar/file.txt').pk, self.distribution.pk)
+        with self.assertNumQueries(1):
+            # only the generation is checked
+            self.assertEqual(self.cache.match('foo/bar/file.txt').pk, self.distribution.pk)
+        self.assertIsNone(self.cache.match('foo/file.txt'))
+
+    def test_content_guard(self):
+        """Content guards are cached with the distributions."""
+        guard = ContentGuard.objects.create(name='guard')
+        BaseDistribution.objects.create(name='baz', base_path='baz', content_guard=guard)
+        self.cache.match('baz/file.txt')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.cache.match('baz/file.txt').content_guard, guard)
+
+    def test_invalidation(self):
+        """Distributions are reloaded once the generation moves on."""
+        self.cache.match('foo/bar/file.txt')
+        BaseDistribution.objects.create(name='baz', base_path='baz')
+        self.assertIsNone(self.cache.match('baz/file.txt'))
+
+        CacheGeneration.objects.create(name=CacheGeneration.DISTRIBUTIONS, value=1)
+        self.assertEqual(self.cache.match('baz/file.txt').name, 'baz')
+
+
+class DistributionsGenerationTestCase(TestCase):
+
+    def test_bump(self):
+        """Only changes of distributions and of what they reference bump the generation."""
+        with patch.object(CacheGeneration.objects, 'bump') as bump:
+            repository = Repository.objects.create(name='foo')
+            bump.assert_not_called()
+            BaseDistribution.objects.create(name='bar', base_path='bar', repository=repository)
+            bump.assert_called_once_with(CacheGeneration.DISTRIBUTIONS)
+            bump.reset_mock()
+            repository.delete()
+            bump.assert_called_with(CacheGeneration.DISTRIBUTIONS)
+
+
+@override_settings(CONTENT_APP_CACHE_REFRESH_INTERVAL=0)
+class LatestVersionCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = LatestVersionCache()
+        self.repository = Repository.objects.create(name='foo')
+        self.version = RepositoryVersion.objects.create(
+            repository=self.repository, number=0, complete=True
+        )
+
+    def test_latest(self):
+        """The latest complete version is cached until the generation moves on."""
+        self.assertEqual(self.cache.get(self.repository), self.version)
+        RepositoryVersion.objects.create(repository=self.repository, number=1)
+        new_version = RepositoryVersion.objects.create(
+            repository=self.repository, number=2, complete=True
+        )
+        with self.assertNumQueries(1):
+            # only the generation is checked
+            self.assertEqual(self.cache.get(self.repository), self.version)
+
+        CacheGeneration.objects.create(name=CacheGeneration.REPOSITORY_VERSIONS, value=1)
+        self.assertEqual(self.cache.get(self.repository), new_version)
+
+
+@override_settings(CONTENT_APP_CACHE_REFRESH_INTERVAL=0, CONTENT_APP_PERMIT_CACHE_TTL=60)
+class PermitCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = PermitCache(10)
+        self.guard = Mock(pk=1)
+
+    def test_decisions(self):
+        """Decisions are cached by guard and key."""
+        self.cache.set(self.guard, 'a', True)
+        self.cache.set(self.guard, 'b', False, 'expired')
+        self.assertEqual(self.cache.get(self.guard, 'a'), (True, ''))
+        self.assertEqual(self.cache.get(self.guard, 'b'), (False, 'expired'))
+        self.assertIsNone(self.cache.get(Mock(pk=2), 'a'))
+
+    def test_ttl(self):
+        """Decisions expire after the TTL."""
+        with self.settings(CONTENT_APP_PERMIT_CACHE_TTL=0):
+            self.cache.set(self.guard, 'a', True)
+        self.assertIsNone(self.cache.get(self.guard, 'a'))
+
+    def test_invalidation(self):
+        """Decisions are dropped when the generation moves on."""
+        self.cache.set(self.guard, 'a', True)
+        self.cache.get(self.guard, 'a')
+        CacheGeneration.objects.create(name=CacheGeneration.DISTRIBUTIONS, value=1)
+        self.assertIsNone(self.cache.get(self.guard, 'a'))
+
+
+@override_settings(CONTENT_APP_CACHE_REFRESH_INTERVAL=0)
+class PublishedPathCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = PublishedPathCache(10)
+        repository = Repository.objects.create(name='foo')
+        version = RepositoryVersion.objects.create(repository=repository, number=0, complete=True)
+        self.publication = Publication.objects.create(repository_version=version, complete=True)
+        metadata = PublishedMetadata.objects.create(
+            publication=self.publication, relative_path='repodata', file='repodata.xml'
+        )
+        self.served_file = ServedFile.for_published_metadata(metadata)
+
+    def test_hit_and_miss(self):
+        """Files and misses of complete publications are cached."""
+        self.cache.set(self.publication, 'repodata', self.served_file)
+        self.cache.set(self.publication, 'missing', NOT_FOUND)
+        self.assertEqual(self.cache.get(self.publication, 'repodata'), self.served_file)
+        self.assertIs(self.cache.get(self.publication, 'missing'), NOT_FOUND)
+        self.assertIsNone(self.cache.get(self.publication, 'other'))
+
+    def test_incomplete(self):
+        """Incomplete publications are not cached."""
+        self.publication.complete = False
+        self.cache.set(self.publication, 'repodata', self.served_file)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_deleted_publication(self):
+        """Entries of deleted publications are dropped when the generation moves on."""
+        self.cache.set(self.publication, 'repodata', self.served_file)
+        self.cache.get(self.publication, 'repodata')
+        Publication.objects.filter(pk=self.publication.pk).delete()
+        CacheGeneration.objects.create(name=CacheGeneration.DISTRIBUTIONS, value=1)
+        self.assertIsNone(self.cache.get(self.publication, 'repodata'))
+        self.assertEqual(len(self.cache), 0)
@@ -0,0 +1,162 @@
+import asyncio
+from unittest.mock import Mock
+
+from django.test import SimpleTestCase
+
+from pulpcore.content.downloads import (
+    RemotePool,
+    RemoteStats,
+    SharedDownload,
+    SubscriptionOverflow,
+)
+
+
+class SharedDownloadTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def read_all(self, subscription):
+        async def read():
+            chunks = []
+            while True:
+                data = await subscription.read()
+                if not data:
+                    return chunks
+                chunks.append(data)
+        return self.loop.run_until_complete(read())
+
+    def test_fan_out(self):
+        """Every subscriber gets the headers and all the data, late ones get it replayed."""
+        download = SharedDownload(max_buffer=10)
+        first = download.subscribe()
+        download.publish_headers({'Content-Length': '6'})
+        download.publish(b'abc')
+        second = download.subscribe()
+        download.publish(b'def')
+        download.finish()
+
+        self.assertEqual(self.loop.run_until_complete(download.headers), {'Content-Length': '6'})
+        self.assertEqual(self.read_all(first), [b'abc', b'def'])
+        self.assertEqual(self.read_all(second), [b'abc', b'def'])
+
+    def test_not_joinable(self):
+        """Subscribing is not possible once more than the buffer was received."""
+        download = SharedDownload(max_buffer=4)
+        download.publish(b'abc')
+        self.assertIsNotNone(download.subscribe())
+        download.publish(b'def')
+        self.assertIsNone(download.subscribe())
+
+    def test_failure(self):
+        """The download failure is raised to every subscriber."""
+        download = SharedDownload(max_buffer=10)
+        subscription = download.subscribe()
+        download.finish(ValueError('boom'))
+        with self.assertRaises(ValueError):
+            self.loop.run_until_complete(download.headers)
+        with self.assertRaises(ValueError):
+            self.read_all(subscription)
+
+    def test_abandon(self):
+        """The download is cancelled when its last subscriber abandons it."""
+        download = SharedDownload(max_buffer=10)
+        download.task = Mock()
+        first = download.subscribe()
+        second = download.subscribe()
+        download.abandon(first)
+        download.task.cancel.assert_not_called()
+        download.abandon(second)
+        download.task.cancel.assert_called_once_with()
+        self.assertIsNone(download.subscribe())
+
+    def test_overflow(self):
+        """Subscribers that fall too far behind are dropped."""
+        download = SharedDownload(max_buffer=4)
+        subscription = download.subscribe()
+        for i in range(3):
+            download.publish(b'abc')
+        download.finish()
+        with self.assertRaises(SubscriptionOverflow):
+            self.read_all(subscription)
+
+
+class RemoteStatsTestCase(SimpleTestCase):
+
+    def test_sort(self):
+        """Remote artifacts are sorted by error rate, then latency, unknown remotes first."""
+        stats = RemoteStats()
+        stats.record(1, 0.5)
+        stats.record(2, 0.1)
+        stats.record(3, 0.1, failed=True)
+        remote_artifacts = [Mock(remote_id=pk) for pk in (3, 1, 2, 4)]
+        self.assertEqual([ra.remote_id for ra in stats.sort(remote_artifacts)], [4, 2, 1, 3])
+
+    def test_moving_average(self):
+        """Recent downloads weigh the most."""
+        stats = RemoteStats()
+        stats.record(1, 1.0, failed=True)
+        stats.record(1, 0.0)
+        self.assertEqual(stats.get(1), (0.8, 0.8))
+
+
+class RemotePoolTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.pool = RemotePool()
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def remote(self, last_updated):
+        closed = []
+
+        async def close():
+            closed.append(True)
+
+        detail = Mock(pk=1, _last_updated=last_updated)
+        detail._download_factory = Mock(spec=['_session'], _session=Mock(close=close))
+        detail.closed = closed
+        return Mock(pk=1, _last_updated=last_updated, cast=Mock(return_value=detail))
+
+    def test_shared(self):
+        """Downloads from an unchanged remote share the same instance."""
+        remote = self.remote(1)
+        first = self.loop.run_until_complete(self.pool.acquire(remote))
+        second = self.loop.run_until_complete(self.pool.acquire(remote))
+        self.assertIs(first, second)
+        self.assertEqual(first.users, 2)
+        remote.cast.assert_called_once_with()
+
+    def test_updated(self):
+        """An updated remote replaces the old one, which is closed once unused."""
+        old = self.loop.run_until_complete(self.pool.acquire(self.remote(1)))
+        new = self.loop.run_until_complete(self.pool.acquire(self.remote(2)))
+        self.assertIsNot(old, new)
+        self.assertTrue(old.retired)
+        self.assertEqual(old.remote.closed, [])
+
+        self.loop.run_until_complete(self.pool.release(old))
+        self.assertEqual(old.remote.closed, [True])
+        self.loop.run_until_complete(self.pool.release(new))
+        self.assertEqual(new.remote.closed, [])
+
+    def test_close(self):
+        """Factories are closed with their close(), or a warning is logged when they can't be."""
+        closed = []
+        remote = Mock(spec=['name', '_download_factory'])
+        remote._download_factory = Mock(spec=['close'], close=lambda: closed.append(True))
+        self.loop.run_until_complete(self.pool._close(remote))
+        self.assertEqual(closed, [True])
+
+        remote._download_factory = Mock(spec=[])
+        with self.assertLogs('pulpcore.content.downloads', 'WARNING'):
+            self.loop.run_until_complete(self.pool._close(remote))
@@ -0,0 +1,66 @@
+import asyncio
+import os
+import tempfile
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer
+from django.test import SimpleTestCase
+
+from pulpcore.content.files import FileSender
+
+
+class FileSenderTestCase(SimpleTestCase):
+
+    data = bytes(range(256)) * 1000
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        fd, self.path = tempfile.mkstemp(suffix='.bin')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(self.data)
+
+    def tearDown(self):
+        os.remove(self.path)
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def get(self, sender, headers=None):
+        async def handler(request):
+            return await sender.respond(request, self.path, {'ETag': '"abc"'})
+
+        async def get():
+            app = web.Application()
+            app.router.add_get('/', handler)
+            async with TestClient(TestServer(app)) as client:
+                response = await client.get('/', headers=headers)
+                return response, await response.read()
+        return self.loop.run_until_complete(get())
+
+    def test_sendfile(self):
+        """The whole file is sent with the additional headers."""
+        response, body = self.get(FileSender())
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['ETag'], '"abc"')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(body, self.data)
+
+    def test_mapped(self):
+        """The file is sent in chunks when sendfile is disabled."""
+        response, body = self.get(FileSender(use_sendfile=False, chunk_size=1000))
+        self.assertEqual(response.status, 200)
+        self.assertEqual(body, self.data)
+
+    def test_range(self):
+        """Only the requested range is sent."""
+        for sender in (FileSender(), FileSender(use_sendfile=False, chunk_size=1000)):
+            response, body = self.get(sender, {'Range': 'bytes=1500-2499'})
+            self.assertEqual(response.status, 206)
+            self.assertEqual(response.headers['Content-Range'], 'bytes 1500-2499/256000')
+            self.assertEqual(body, self.data[1500:2500])
+
+    def test_range_not_satisfiable(self):
+        """Ranges outside of the file are answered with 416."""
+        response, body = self.get(FileSender(), {'Range': 'bytes=300000-'})
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.headers['Content-Range'], 'bytes */256000')
@@ -1,9 +1,18 @@
-from unittest.mock import Mock
+import asyncio
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock, patch
+from uuid import uuid4
 
+from aiohttp.client_exceptions import ClientResponseError
+from aiohttp.test_utils import make_mocked_request
+from aiohttp.web_exceptions import HTTPForbidden, HTTPTooManyRequests
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils.http import http_date
 
 from pulpcore.content import Handler
+from pulpcore.content.handler import ServedFile
+from pulpcore.content.limits import Limiter
 from pulpcore.plugin.models import Artifact, Content, ContentArtifact
 
 
@@ -44,3 +53,277 @@ class HandlerSaveContentTestCase(TestCase):
         c2 = Content.objects.get(pk=self.c2.pk)
         self.assertEqual(existing_artifact.pk, new_artifact.pk)
         self.assertEqual(c2._artifacts.get().pk, existing_artifact.pk)
+
+
+class HandlerConditionalRequestTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stored = datetime(2019, 7, 1, 12, 0, 0, tzinfo=timezone.utc)
+        self.served_file = ServedFile(Mock(), '"abc123"', self.stored)
+
+    def serve(self, headers):
+        loop = asyncio.new_event_loop()
+        try:
+            request = make_mocked_request('GET', '/', headers=headers, loop=loop)
+            return loop.run_until_complete(Handler()._serve_file(request, self.served_file))
+        finally:
+            loop.close()
+
+    def test_if_none_match(self):
+        """A matching ETag is answered with 304 without opening the file."""
+        response = self.serve({'If-None-Match': 'W/"other", "abc123"'})
+        self.assertEqual(response.status, 304)
+        self.assertEqual(response.headers['ETag'], '"abc123"')
+
+    def test_if_none_match_mismatch(self):
+        """A different ETag is not answered with 304, even if not modified since."""
+        handler = Handler()
+        request = make_mocked_request('GET', '/', headers={
+            'If-None-Match': '"other"',
+            'If-Modified-Since': http_date(self.stored.timestamp()),
+        })
+        self.assertFalse(handler._not_modified(request, '"abc123"', self.stored))
+
+    def test_if_modified_since(self):
+        """The stored time is compared to If-Modified-Since."""
+        handler = Handler()
+        later = make_mocked_request('GET', '/', headers={
+            'If-Modified-Since': http_date((self.stored + timedelta(days=1)).timestamp())
+        })
+        earlier = make_mocked_request('GET', '/', headers={
+            'If-Modified-Since': http_date((self.stored - timedelta(days=1)).timestamp())
+        })
+        self.assertTrue(handler._not_modified(later, '"abc123"', self.stored))
+        self.assertFalse(handler._not_modified(earlier, '"abc123"', self.stored))
+
+
+class HandlerContentEncodingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.stored = datetime(2019, 7, 1, 12, 0, 0, tzinfo=timezone.utc)
+        self.gzip = ServedFile(Mock(), '"gz"', self.stored)
+        self.br = ServedFile(Mock(), '"br"', self.stored)
+        self.served_file = ServedFile(
+            Mock(), '"abc123"', self.stored, (('br', self.br), ('gzip', self.gzip))
+        )
+        self.served_file.file.name = 'repodata/repomd.xml'
+        self.handler = Handler()
+        self.handler.file_responder = Mock(sends_headers=True)
+        self.responses = []
+
+        async def respond(request, file, headers):
+            self.responses.append((file, headers))
+
+        self.handler.file_responder.respond = respond
+
+    def serve(self, accept_encoding=None):
+        loop = asyncio.new_event_loop()
+        try:
+            headers = {'Accept-Encoding': accept_encoding} if accept_encoding else {}
+            request = make_mocked_request('GET', '/', headers=headers, loop=loop)
+            loop.run_until_complete(self.handler._serve_file(request, self.served_file))
+        finally:
+            loop.close()
+        return self.responses.pop()
+
+    def test_accepted(self):
+        """The most preferred compressed copy accepted is served with its encoding."""
+        file, headers = self.serve('gzip, deflate')
+        self.assertIs(file, self.gzip.file)
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Content-Type'], 'application/xml')
+        self.assertEqual(headers['ETag'], '"gz"')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+        file, headers = self.serve('gzip, br')
+        self.assertIs(file, self.br.file)
+        file, headers = self.serve('gzip;q=1.0, br;q=0.5')
+        self.assertIs(file, self.gzip.file)
+
+    def test_not_accepted(self):
+        """The file itself is served when no compressed copy is accepted."""
+        for accept_encoding in (None, 'deflate', 'gzip;q=0, br;q=0'):
+            file, headers = self.serve(accept_encoding)
+            self.assertIs(file, self.served_file.file)
+            self.assertNotIn('Content-Encoding', headers)
+            self.assertEqual(headers['ETag'], '"abc123"')
+            self.assertEqual(headers['Vary'], 'Accept-Encoding')
+
+    def test_redirect(self):
+        """Compressed copies are not redirected to, as the client can't tell the encoding."""
+        self.handler.file_responder.sends_headers = False
+        file, headers = self.serve('gzip')
+        self.assertIs(file, self.served_file.file)
+        self.assertNotIn('Content-Encoding', headers)
+
+    def test_legacy_handle_file_response(self):
+        """Subclasses overriding the synchronous _handle_file_response() are served with it."""
+        class LegacyHandler(Handler):
+            def __init__(self):
+                pass
+
+            def _handle_file_response(self, file):
+                return file
+
+        handler = LegacyHandler()
+        handler.file_responder = Mock(sends_headers=True)
+        loop = asyncio.new_event_loop()
+        try:
+            request = make_mocked_request('GET', '/', headers={'Accept-Encoding': 'gzip'},
+                                          loop=loop)
+            served = loop.run_until_complete(handler._serve_file(request, self.served_file))
+        finally:
+            loop.close()
+        self.assertIs(served, self.served_file.file)
+
+
+@override_settings(CONTENT_APP_PERMIT_CACHE_TTL=60)
+class HandlerPermitTestCase(TestCase):
+
+    def setUp(self):
+        self.guard = Mock(pk=uuid4())
+        self.guard.cast.return_value = self.guard
+        self.distribution = Mock(content_guard=self.guard)
+        self.request = make_mocked_request('GET', '/')
+
+    def test_cached_permit(self):
+        """Guards with a cache key are asked once per key."""
+        self.guard.get_permit_cache_key.return_value = 'fingerprint'
+        Handler._permit(self.request, self.distribution)
+        Handler._permit(self.request, self.distribution)
+        self.guard.permit.assert_called_once_with(self.request)
+
+    def test_cached_denial(self):
+        """Denials are cached too."""
+        self.guard.get_permit_cache_key.return_value = 'fingerprint'
+        self.guard.permit.side_effect = PermissionError('denied')
+        for i in range(2):
+            with self.assertRaises(HTTPForbidden):
+                Handler._permit(self.request, self.distribution)
+        self.guard.permit.assert_called_once_with(self.request)
+
+    def test_uncached_permit(self):
+        """Guards without a cache key are asked for every request."""
+        self.guard.get_permit_cache_key.return_value = None
+        Handler._permit(self.request, self.distribution)
+        Handler._permit(self.request, self.distribution)
+        self.assertEqual(self.guard.permit.call_count, 2)
+
+
+@override_settings(CONTENT_APP_HEDGE_DELAY=0.01)
+class HandlerHedgingTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.remote_artifacts = [Mock(remote_id=uuid4(), sha256=None) for i in range(2)]
+        self.content_artifact = Mock()
+        self.content_artifact.remoteartifact_set.select_related.return_value = \
+            self.remote_artifacts
+        self.downloads = {}
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def stream(self, handler):
+        def join_download(remote_artifact):
+            download = Mock(headers=self.loop.create_future())
+            self.downloads[remote_artifact] = download
+            return download, Mock()
+
+        async def stream_download(request, response, remote_artifact, download, subscription):
+            return remote_artifact
+
+        handler._join_download = join_download
+        handler._stream_download = stream_download
+        request = make_mocked_request('GET', '/', loop=self.loop)
+        return self.loop.run_until_complete(
+            handler._stream_content_artifact(request, Mock(), self.content_artifact)
+        )
+
+    def test_hedge(self):
+        """The next remote is tried when the first is slow, and the first to respond is used."""
+        handler = Handler()
+
+        async def respond_second():
+            while self.remote_artifacts[1] not in self.downloads:
+                await asyncio.sleep(0.005)
+            self.downloads[self.remote_artifacts[1]].headers.set_result({})
+
+        self.loop.create_task(respond_second())
+        self.assertIs(self.stream(handler), self.remote_artifacts[1])
+        self.downloads[self.remote_artifacts[0]].abandon.assert_called_once()
+
+    def test_failover(self):
+        """The next remote is tried when the first fails."""
+        handler = Handler()
+
+        async def fail_first():
+            while self.remote_artifacts[0] not in self.downloads:
+                await asyncio.sleep(0)
+            self.downloads[self.remote_artifacts[0]].headers.set_exception(
+                ClientResponseError(Mock(), (), status=404)
+            )
+            while self.remote_artifacts[1] not in self.downloads:
+                await asyncio.sleep(0)
+            self.downloads[self.remote_artifacts[1]].headers.set_result({})
+
+        with self.settings(CONTENT_APP_HEDGE_DELAY=None):
+            self.loop.create_task(fail_first())
+            self.assertIs(self.stream(handler), self.remote_artifacts[1])
+
+
+class HandlerMissingPathTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.version = Mock(pk=uuid4(), complete=True)
+        self.version.get_content_artifact.side_effect = ContentArtifact.DoesNotExist()
+        self.distribution = Mock(pk=uuid4(), remote=None, remote_id=None, publication=None,
+                                 repository=None, repository_version=self.version)
+
+    def test_missing_path(self):
+        """Missing paths are remembered."""
+        handler = Handler()
+        self.assertIsNone(handler._match_path(self.distribution, 'missing'))
+        self.assertIsNone(handler._match_path(self.distribution, 'missing'))
+        self.version.get_content_artifact.assert_called_once_with('missing')
+
+    def test_incomplete_version(self):
+        """Missing paths of versions that might still change are not remembered."""
+        self.version.complete = False
+        handler = Handler()
+        handler._match_path(self.distribution, 'missing')
+        handler._match_path(self.distribution, 'missing')
+        self.assertEqual(self.version.get_content_artifact.call_count, 2)
+
+    def test_lookup_kind(self):
+        """Lookups are observed by how the path was found."""
+        handler = Handler()
+        with patch('pulpcore.content.handler.lookup_seconds') as lookup_seconds:
+            handler._match_path(self.distribution, 'missing')
+            handler._match_path(self.distribution, 'missing')
+        self.assertEqual([c[0][1] for c in lookup_seconds.observe.call_args_list],
+                         ['not_found', 'missing'])
+
+
+@override_settings(CONTENT_APP_LIMIT_QUEUE_TIMEOUT=0)
+class HandlerRateLimitTestCase(SimpleTestCase):
+
+    def test_too_many_requests(self):
+        """Clients over their rate limit are told when to retry."""
+        loop = asyncio.new_event_loop()
+        try:
+            request = make_mocked_request('GET', '/pulp/content/foo/bar', loop=loop,
+                                          match_info={'path': 'foo/bar'})
+            limiter = Limiter(rate=0.5, burst=1)
+            loop.run_until_complete(limiter.acquire(request.remote, timeout=0))
+            handler = Handler()
+            handler._match_and_stream = Mock()
+            with patch('pulpcore.content.handler.client_limiter', limiter):
+                with self.assertRaises(HTTPTooManyRequests) as cm:
+                    loop.run_until_complete(handler.stream_content(request))
+        finally:
+            loop.close()
+        self.assertEqual(cm.exception.headers['Retry-After'], '2')
+        handler._match_and_stream.assert_not_called()
@@ -0,0 +1,85 @@
+import asyncio
+
+from django.test import SimpleTestCase
+
+from pulpcore.content.limits import Limiter, RateLimited, TokenBucket
+
+
+class TokenBucketTestCase(SimpleTestCase):
+
+    def test_reserve(self):
+        """Bursts are allowed, then tokens are given at the rate."""
+        bucket = TokenBucket(rate=2, burst=2)
+        now = bucket.updated
+        self.assertEqual(bucket.reserve(now), 0)
+        self.assertEqual(bucket.reserve(now), 0)
+        self.assertEqual(bucket.reserve(now), 0.5)
+        self.assertEqual(bucket.reserve(now + 1.5), 0)
+
+    def test_cancel(self):
+        """Cancelled reservations give the token back."""
+        bucket = TokenBucket(rate=1, burst=1)
+        now = bucket.updated
+        bucket.reserve(now)
+        bucket.reserve(now)
+        bucket.cancel()
+        self.assertEqual(bucket.reserve(now), 1)
+
+
+class LimiterTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_rate(self):
+        """Requests over the rate are rejected with the time to retry after."""
+        limiter = Limiter(rate=1, burst=2)
+        for i in range(2):
+            self.loop.run_until_complete(limiter.acquire('client', timeout=0))
+        with self.assertRaises(RateLimited) as cm:
+            self.loop.run_until_complete(limiter.acquire('client', timeout=0))
+        self.assertAlmostEqual(cm.exception.retry_after, 1, places=2)
+        # Other keys have their own bucket
+        self.loop.run_until_complete(limiter.acquire('other', timeout=0))
+
+    def test_rate_queued(self):
+        """Requests over the rate wait for a token within the timeout."""
+        limiter = Limiter(rate=100, burst=1)
+        self.loop.run_until_complete(limiter.acquire('client', timeout=0))
+        self.loop.run_until_complete(limiter.acquire('client', timeout=1))
+        self.assertEqual(limiter.in_flight['client'], 2)
+
+    def test_max_in_flight(self):
+        """Requests over the cap are rejected when the timeout expires."""
+        limiter = Limiter(max_in_flight=1)
+        self.loop.run_until_complete(limiter.acquire('client', timeout=0))
+        with self.assertRaises(RateLimited):
+            self.loop.run_until_complete(limiter.acquire('client', timeout=0.01))
+        limiter.release('client')
+        self.assertEqual(dict(limiter.in_flight), {})
+
+    def test_max_in_flight_queued(self):
+        """Released requests let the queued ones in, in order."""
+        limiter = Limiter(max_in_flight=1)
+        admitted = []
+
+        async def request(name):
+            async with limiter.limit('client', timeout=1):
+                admitted.append(name)
+                await asyncio.sleep(0)
+
+        self.loop.run_until_complete(asyncio.gather(request(1), request(2), request(3)))
+        self.assertEqual(admitted, [1, 2, 3])
+        self.assertEqual(dict(limiter.in_flight), {})
+
+    def test_unlimited(self):
+        """A limiter without limits lets everything through."""
+        limiter = Limiter()
+        for i in range(100):
+            self.loop.run_until_complete(limiter.acquire('client', timeout=0))
+        self.assertEqual(limiter.in_flight['client'], 100)
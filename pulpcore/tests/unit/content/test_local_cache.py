@@ -0,0 +1,91 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from unittest.mock import Mock
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase
+
+from pulpcore.content.local_cache import LocalFileCache
+
+
+class LocalFileCacheTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.storage_dir = tempfile.mkdtemp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.storage = FileSystemStorage(location=self.storage_dir)
+
+    def tearDown(self):
+        self.loop.close()
+        asyncio.set_event_loop(None)
+        shutil.rmtree(self.storage_dir)
+        shutil.rmtree(self.cache_dir)
+
+    def artifact(self, data):
+        digest = hashlib.sha256(data).hexdigest()
+        name = self.storage.save('artifact/{}/{}'.format(digest[:2], digest[2:]),
+                                 ContentFile(data))
+        file = Mock(storage=self.storage)
+        file.name = name
+        return file
+
+    def get(self, cache, *files):
+        return self.loop.run_until_complete(asyncio.gather(*(cache.get(f) for f in files)))
+
+    def test_key(self):
+        """Artifacts are kept by their digest, other files by the digest of their name."""
+        digest = 'ab' + 'c' * 62
+        self.assertEqual(LocalFileCache.key('artifact/ab/' + 'c' * 62), (digest, True))
+        self.assertEqual(LocalFileCache.key('published/metadata/repomd.xml'), (
+            hashlib.sha256(b'published/metadata/repomd.xml').hexdigest(), False
+        ))
+
+    def test_read_through(self):
+        """Files are fetched from the storage once, even when requested concurrently."""
+        cache = LocalFileCache(self.cache_dir, 1024)
+        file = self.artifact(b'abc')
+        first, second = self.get(cache, file, file)
+        self.assertEqual(first, second)
+        with open(first, 'rb') as f:
+            self.assertEqual(f.read(), b'abc')
+        self.get(cache, file)
+        self.assertEqual(cache.stats(), {'hits': 1, 'misses': 2, 'entries': 1, 'memory': 3})
+
+    def test_eviction(self):
+        """The least recently used files are evicted when over the size."""
+        cache = LocalFileCache(self.cache_dir, 8)
+        a, b, c = (self.artifact(data) for data in (b'aaaa', b'bbbb', b'cccc'))
+        path_a, = self.get(cache, a)
+        path_b, = self.get(cache, b)
+        self.get(cache, a)
+        self.get(cache, c)
+        self.assertTrue(os.path.exists(path_a))
+        self.assertFalse(os.path.exists(path_b))
+        self.assertEqual(cache.size, 8)
+
+    def test_digest_mismatch(self):
+        """Artifacts whose content does not match their digest are not cached."""
+        cache = LocalFileCache(self.cache_dir, 1024)
+        file = self.artifact(b'abc')
+        with open(self.storage.path(file.name), 'wb') as f:
+            f.write(b'corrupted')
+        with self.assertRaises(ValueError):
+            self.get(cache, file)
+        self.assertEqual(cache.size, 0)
+        self.assertEqual([files for root, dirs, files in os.walk(self.cache_dir) if files], [])
+
+    def test_load(self):
+        """Files cached by a previous process are accounted for."""
+        file = self.artifact(b'abc')
+        self.get(LocalFileCache(self.cache_dir, 1024), file)
+        cache = LocalFileCache(self.cache_dir, 1024)
+        cache.load()
+        self.assertEqual(cache.size, 3)
+        self.get(cache, file)
+        self.assertEqual(cache.hits, 1)
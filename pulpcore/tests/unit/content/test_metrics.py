@@ -0,0 +1,65 @@
+from django.test import SimpleTestCase
+
+from pulpcore.content.cache import LRUCache
+from pulpcore.content.metrics import Collected, Counter, Histogram, render
+
+
+class MetricsTestCase(SimpleTestCase):
+
+    def test_counter(self):
+        """Counters are rendered per label values."""
+        counter = Counter('requests_total', 'Requests.', ['limit'])
+        counter.inc('client')
+        counter.inc('client', amount=2)
+        counter.inc('remote')
+        self.assertEqual(counter.render(), [
+            '# HELP requests_total Requests.',
+            '# TYPE requests_total counter',
+            'requests_total{limit="client"} 3',
+            'requests_total{limit="remote"} 1',
+        ])
+
+    def test_histogram(self):
+        """Histograms count the observations in cumulative buckets."""
+        histogram = Histogram('stage_seconds', 'Stages.', ['stage'])
+        histogram.observe(0.003, 'send')
+        histogram.observe(0.005, 'send')
+        histogram.observe(100, 'send')
+        lines = histogram.render()
+        self.assertIn('stage_seconds_bucket{stage="send",le="0.001"} 0', lines)
+        self.assertIn('stage_seconds_bucket{stage="send",le="0.005"} 2', lines)
+        self.assertIn('stage_seconds_bucket{stage="send",le="60"} 2', lines)
+        self.assertIn('stage_seconds_bucket{stage="send",le="+Inf"} 3', lines)
+        self.assertIn('stage_seconds_sum{stage="send"} 100.008', lines)
+        self.assertIn('stage_seconds_count{stage="send"} 3', lines)
+
+    def test_histogram_timed(self):
+        """Timed callables are observed, even when they raise."""
+        histogram = Histogram('stage_seconds', 'Stages.', ['stage'])
+
+        def fail():
+            raise ValueError()
+
+        with self.assertRaises(ValueError):
+            histogram.timed(fail, 'save')()
+        self.assertIn('stage_seconds_count{stage="save"} 1', histogram.render())
+
+    def test_collected(self):
+        """Collected metrics are read when rendered, label values are escaped."""
+        cache = LRUCache(10)
+        cache.set('a', 1)
+        cache.get('a')
+        cache.get('b')
+        metric = Collected('cache_hits_total', 'Hits.', ['cache'],
+                           lambda: [(('"lru"',), cache.stats()['hits'])], metric_type='counter')
+        self.assertEqual(metric.render()[1:], [
+            '# TYPE cache_hits_total counter',
+            'cache_hits_total{cache="\\"lru\\""} 1',
+        ])
+
+    def test_render(self):
+        """Every metric of the content app is rendered."""
+        text = render()
+        self.assertIn('# TYPE pulp_content_stage_seconds histogram\n', text)
+        self.assertIn('pulp_content_cache_hit_ratio{cache="published_path"}', text)
+        self.assertIn('pulp_content_saves_total{result="saved"}', text)
@@ -0,0 +1,44 @@
+import asyncio
+
+from django.test import SimpleTestCase, override_settings
+
+from pulpcore.content.persistence import ArtifactSaver
+
+
+# Added in Python 3.7, Task.all_tasks() was removed in Python 3.9
+all_tasks = getattr(asyncio, 'all_tasks', None) or asyncio.Task.all_tasks
+
+
+@override_settings(CONTENT_APP_SAVE_QUEUE_SIZE=2, CONTENT_APP_SAVE_WORKERS=1)
+class ArtifactSaverTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+
+    def tearDown(self):
+        tasks = all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def test_saves(self):
+        """Queued saves run in the background and are counted."""
+        saver = ArtifactSaver()
+        saved = []
+
+        def fail():
+            raise ValueError()
+
+        async def run():
+            await saver.put(saved.append, 1)
+            await saver.put(fail)
+            await saver.put(saved.append, 2)
+            await saver.join()
+
+        with self.assertLogs('pulpcore.content.persistence', 'ERROR'):
+            self.loop.run_until_complete(run())
+        self.assertEqual(saved, [1, 2])
+        self.assertEqual(saver.stats(), {'pending': 0, 'max_pending': 3, 'saved': 2, 'failed': 1})
@@ -0,0 +1,130 @@
+import asyncio
+import shutil
+import tempfile
+from unittest.mock import Mock, patch
+
+from aiohttp import web
+from aiohttp.test_utils import TestClient, TestServer, make_mocked_request
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from aiohttp.web_exceptions import HTTPFound
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+
+from pulpcore.content.responders import (
+    FileSystemResponder,
+    LocalCacheResponder,
+    PresignedRedirectResponder,
+    ProxyResponder,
+    get_file_responder,
+    responders,
+)
+
+
+class GetFileResponderTestCase(SimpleTestCase):
+
+    @override_settings(DEFAULT_FILE_STORAGE='pulpcore.app.models.storage.FileSystem')
+    def test_default(self):
+        """The responder is chosen from the storage."""
+        self.assertIsInstance(get_file_responder(), FileSystemResponder)
+        with self.settings(DEFAULT_FILE_STORAGE='storages.backends.s3boto3.S3Boto3Storage'):
+            self.assertIsInstance(get_file_responder(), PresignedRedirectResponder)
+        with self.settings(DEFAULT_FILE_STORAGE='some.other.Storage'):
+            self.assertIsInstance(get_file_responder(), ProxyResponder)
+
+    def test_setting(self):
+        """The responder can be configured."""
+        with self.settings(CONTENT_APP_FILE_RESPONDER='proxy'):
+            self.assertIsInstance(get_file_responder(), ProxyResponder)
+        with self.settings(CONTENT_APP_FILE_RESPONDER='local-cache',
+                           CONTENT_APP_LOCAL_CACHE_DIR='/nonexistent/'):
+            self.assertIsInstance(get_file_responder(), LocalCacheResponder)
+        with self.settings(CONTENT_APP_FILE_RESPONDER='unknown'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_file_responder()
+
+    def test_responder_error(self):
+        """Errors creating a known responder are not reported as an unknown responder."""
+        with self.settings(CONTENT_APP_FILE_RESPONDER='proxy'):
+            with patch.dict(responders, proxy=Mock(side_effect=KeyError('setting'))):
+                with self.assertRaises(KeyError):
+                    get_file_responder()
+
+
+class PresignedRedirectResponderTestCase(SimpleTestCase):
+
+    def redirect(self, responder, file):
+        loop = asyncio.new_event_loop()
+        try:
+            request = make_mocked_request('GET', '/', loop=loop)
+            with self.assertRaises(HTTPFound) as redirect:
+                loop.run_until_complete(responder.respond(request, file, {}))
+            return redirect.exception.location
+        finally:
+            loop.close()
+
+    def test_cached_url(self):
+        """Presigned URLs are reused while valid long enough."""
+        responder = PresignedRedirectResponder()
+        file = Mock(url='https://bucket/a?sig=1', storage=Mock(querystring_expire=3600))
+        file.name = 'a'
+        self.assertEqual(self.redirect(responder, file), 'https://bucket/a?sig=1')
+        file.url = 'https://bucket/a?sig=2'
+        self.assertEqual(self.redirect(responder, file), 'https://bucket/a?sig=1')
+
+        file.storage.querystring_expire = 0
+        responder = PresignedRedirectResponder()
+        self.redirect(responder, file)
+        file.url = 'https://bucket/a?sig=3'
+        self.assertEqual(self.redirect(responder, file), 'https://bucket/a?sig=3')
+
+
+class ProxyResponderTestCase(SimpleTestCase):
+
+    data = bytes(range(256)) * 100
+
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.location = tempfile.mkdtemp()
+        storage = FileSystemStorage(location=self.location)
+        storage.save('a.bin', ContentFile(self.data))
+        self.file = Mock(storage=storage, size=len(self.data))
+        self.file.name = 'a.bin'
+
+    def tearDown(self):
+        shutil.rmtree(self.location)
+        self.loop.close()
+        asyncio.set_event_loop(None)
+
+    def get(self, headers=None):
+        responder = ProxyResponder()
+        responder.chunk_size = 1000
+
+        async def handler(request):
+            return await responder.respond(request, self.file, {})
+
+        async def get():
+            app = web.Application()
+            app.router.add_get('/', handler)
+            async with TestClient(TestServer(app)) as client:
+                response = await client.get('/', headers=headers)
+                return response, await response.read()
+        return self.loop.run_until_complete(get())
+
+    def test_whole_file(self):
+        """The whole file is streamed with its length."""
+        response, body = self.get()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Length'], str(len(self.data)))
+        self.assertEqual(body, self.data)
+
+    def test_range(self):
+        """Only the requested range is streamed, and ranges outside of the file get 416."""
+        response, body = self.get({'Range': 'bytes=1500-2499'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.headers['Content-Range'], 'bytes 1500-2499/25600')
+        self.assertEqual(body, self.data[1500:2500])
+
+        response, body = self.get({'Range': 'bytes=30000-'})
+        self.assertEqual(response.status, 416)
@@ -0,0 +1,25 @@
+import socket
+
+from django.test import SimpleTestCase
+
+from pulpcore.content import _bind
+
+
+class BindTestCase(SimpleTestCase):
+
+    def test_reuse_port(self):
+        """Several workers can listen on the same port."""
+        first = _bind('127.0.0.1', 0)
+        second = _bind('127.0.0.1', first[0].getsockname()[1])
+        for sock in first + second:
+            sock.close()
+
+    def test_ipv6(self):
+        """IPv6 addresses can be listened on."""
+        try:
+            socks = _bind('::1', 0)
+        except OSError:
+            self.skipTest('IPv6 is not available')
+        self.assertEqual([sock.family for sock in socks], [socket.AF_INET6])
+        for sock in socks:
+            sock.close()
@@ -0,0 +1,146 @@
+import gzip
+import os
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.test import TestCase
+
+from pulpcore.app.models import (
+    CompressedMetadata,
+    Content,
+    ContentArtifact,
+    Publication,
+    PublishedArtifact,
+    PublishedMetadata,
+    Repository,
+    RepositoryVersion,
+)
+
+
+class PublicationIndexPathsTestCase(TestCase):
+
+    def setUp(self):
+        repository = Repository.objects.create(name='foo')
+        self.contents = [Content.objects.create() for i in range(3)]
+        self.content_artifacts = [
+            ContentArtifact.objects.create(content=content, relative_path='c{}'.format(i))
+            for i, content in enumerate(self.contents)
+        ]
+        self.version = RepositoryVersion.objects.create(repository=repository, number=1)
+        self.version.add_content(Content.objects.all())
+        self.version.complete = True
+        self.version.save()
+
+    def test_index_paths(self):
+        """Published artifacts and metadata are indexed on completion."""
+        publication = Publication.objects.create(repository_version=self.version)
+        with publication:
+            PublishedArtifact.objects.create(
+                publication=publication, relative_path='a/c0',
+                content_artifact=self.content_artifacts[0]
+            )
+            metadata = PublishedMetadata.objects.create(
+                publication=publication, relative_path='repodata', file='repodata.xml'
+            )
+
+        paths = {p.relative_path: p for p in publication.published_paths.all()}
+        self.assertEqual(set(paths), {'a/c0', 'repodata'})
+        self.assertEqual(paths['a/c0'].content_artifact_id, self.content_artifacts[0].pk)
+        self.assertEqual(paths['repodata'].published_metadata_id, metadata.pk)
+
+    def test_index_paths_pass_through(self):
+        """Pass-through content artifacts are indexed after the published ones."""
+        publication = Publication.objects.create(repository_version=self.version,
+                                                 pass_through=True)
+        with publication:
+            PublishedArtifact.objects.create(
+                publication=publication, relative_path='c1',
+                content_artifact=self.content_artifacts[0]
+            )
+
+        paths = dict(publication.published_paths.values_list(
+            'relative_path', 'content_artifact_id'
+        ))
+        self.assertEqual(paths, {
+            'c0': self.content_artifacts[0].pk,
+            'c1': self.content_artifacts[0].pk,
+            'c2': self.content_artifacts[2].pk,
+        })
+
+    def test_index_paths_save(self):
+        """Paths are indexed when the publication is saved complete without the context manager."""
+        publication = Publication.objects.create(repository_version=self.version)
+        PublishedArtifact.objects.create(
+            publication=publication, relative_path='a/c0',
+            content_artifact=self.content_artifacts[0]
+        )
+        publication.complete = True
+        publication.save()
+
+        self.assertEqual(
+            list(publication.published_paths.values_list('relative_path', flat=True)), ['a/c0']
+        )
+
+
+def relative_metadata_path(model, name):
+    # Django 2.2.21+ refuses the absolute names of published_metadata_path()
+    return os.path.join('published', 'metadata', str(uuid4()), name)
+
+
+@patch('pulpcore.app.models.storage.published_metadata_path', relative_metadata_path)
+class PublicationCompressMetadataTestCase(TestCase):
+
+    def setUp(self):
+        repository = Repository.objects.create(name='foo')
+        version = RepositoryVersion.objects.create(repository=repository, number=1, complete=True)
+        self.publication = Publication.objects.create(repository_version=version)
+        self.data = b'<metadata/>' * 1000
+
+    def metadata(self, name, data):
+        return PublishedMetadata.objects.create(
+            publication=self.publication, relative_path=name, file=ContentFile(data, name=name)
+        )
+
+    def test_compress_metadata(self):
+        """Metadata files are compressed, unless already compressed, small or incompressible."""
+        metadata = self.metadata('repomd.xml', self.data)
+        self.metadata('primary.xml.gz', gzip.compress(self.data))
+        self.metadata('small.xml', b'<metadata/>')
+        self.metadata('random.bin', os.urandom(4096))
+
+        self.publication.compress_metadata(['gzip'])
+
+        compressed = metadata.compressed_metadata.get()
+        self.assertEqual(compressed.encoding, 'gzip')
+        self.assertTrue(compressed.file.name.endswith('/repomd.xml.gz'))
+        with compressed.file.open('rb') as f:
+            self.assertEqual(gzip.decompress(f.read()), self.data)
+        self.assertEqual(
+            PublishedMetadata.objects.filter(compressed_metadata__isnull=False).count(), 1
+        )
+
+    def test_compress_metadata_disabled(self):
+        """Nothing is compressed without encodings."""
+        self.metadata('repomd.xml', self.data)
+        with self.settings(PUBLISHED_METADATA_ENCODINGS=[]):
+            with self.publication:
+                pass
+        self.assertFalse(
+            PublishedMetadata.objects.filter(compressed_metadata__isnull=False).exists()
+        )
+
+    def test_compress_metadata_failure(self):
+        """The publication and its compressed files are deleted when compressing fails."""
+        metadata = self.metadata('repomd.xml', self.data)
+        compressed = CompressedMetadata.objects.create(
+            published_metadata=metadata, encoding='gzip',
+            file=ContentFile(gzip.compress(self.data), name='repomd.xml.gz')
+        )
+        with patch.object(Publication, 'compress_metadata', side_effect=ImproperlyConfigured()):
+            with self.assertRaises(ImproperlyConfigured):
+                with self.publication:
+                    pass
+        self.assertFalse(Publication.objects.filter(pk=self.publication.pk).exists())
+        self.assertFalse(compressed.file.storage.exists(compressed.file.name))
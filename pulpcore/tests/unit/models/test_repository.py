@@ -0,0 +1,349 @@
+from unittest.mock import Mock, patch
+import uuid
+
+from django.test import TestCase
+
+from pulpcore.app.models import (
+    Content,
+    ContentArtifact,
+    Repository,
+    RepositoryContent,
+    RepositoryVersion,
+    Task,
+)
+
+
+class RepositoryVersionGetContentArtifactTestCase(TestCase):
+
+    def setUp(self):
+        self.repository = Repository.objects.create(name='foo')
+        self.contents = [Content.objects.create() for i in range(2)]
+        self.content_artifacts = [
+            ContentArtifact.objects.create(content=content, relative_path='c{}'.format(i))
+            for i, content in enumerate(self.contents)
+        ]
+        self.version1 = RepositoryVersion.objects.create(repository=self.repository, number=1)
+        self.version1.add_content(Content.objects.all())
+        self.version2 = RepositoryVersion.objects.create(repository=self.repository, number=2)
+        self.version2.remove_content(Content.objects.filter(pk=self.contents[0].pk))
+
+    def test_get_content_artifact(self):
+        """The ContentArtifacts of the content in the version are found by path."""
+        self.assertEqual(self.version1.get_content_artifact('c0'), self.content_artifacts[0])
+        self.assertEqual(self.version2.get_content_artifact('c1'), self.content_artifacts[1])
+
+    def test_not_in_version(self):
+        """ContentArtifacts of content not in the version are not found."""
+        other = RepositoryVersion.objects.create(
+            repository=Repository.objects.create(name='bar'), number=1
+        )
+        for version, path in ((self.version2, 'c0'), (other, 'c1'), (self.version1, 'c2')):
+            with self.assertRaises(ContentArtifact.DoesNotExist):
+                version.get_content_artifact(path)
+
+
+class RepositoryContentNumbersTestCase(TestCase):
+
+    def setUp(self):
+        self.repository = Repository.objects.create(name='foo')
+        self.contents = [Content.objects.create() for i in range(3)]
+        self.versions = []
+        for number in (1, 2, 3):
+            version = RepositoryVersion.objects.create(repository=self.repository, number=number)
+            self.versions.append(version)
+            if number == 1:
+                version.add_content(Content.objects.filter(pk__in=self.pks(0, 1)))
+            elif number == 2:
+                version.remove_content(Content.objects.filter(pk__in=self.pks(0)))
+            else:
+                version.add_content(Content.objects.filter(pk__in=self.pks(2)))
+            version.complete = True
+            version.save()
+
+    def pks(self, *indexes):
+        return [self.contents[i].pk for i in indexes]
+
+    def numbers(self):
+        return sorted(RepositoryContent.objects.filter(repository=self.repository).values_list(
+            'content', 'number_added', 'number_removed'
+        ))
+
+    def content(self, version):
+        return set(version.content.values_list('pk', flat=True))
+
+    def test_numbers(self):
+        """The numbers of the versions adding and removing content are stored."""
+        c0, c1, c2 = (c.pk for c in self.contents)
+        self.assertEqual(self.numbers(), sorted([(c0, 1, 2), (c1, 1, None), (c2, 3, None)]))
+        self.assertEqual(self.content(self.versions[0]), {c0, c1})
+        self.assertEqual(self.content(self.versions[1]), {c1})
+        self.assertEqual(self.content(self.versions[2]), {c1, c2})
+
+    def test_squash(self):
+        """The numbers follow the versions when a version is squashed into the next one."""
+        c0, c1, c2 = (c.pk for c in self.contents)
+        self.versions[1].delete()
+        self.assertEqual(self.numbers(), sorted([(c0, 1, 3), (c1, 1, None), (c2, 3, None)]))
+        self.versions[0].delete()
+        self.assertEqual(self.numbers(), sorted([(c1, 3, None), (c2, 3, None)]))
+        self.assertEqual(self.content(self.versions[2]), {c1, c2})
+
+    def test_save(self):
+        """The numbers are set from the versions when not given."""
+        membership = RepositoryContent.objects.create(
+            repository=self.repository, content=Content.objects.create(),
+            version_added=self.versions[1], version_removed=self.versions[2]
+        )
+        self.assertEqual((membership.number_added, membership.number_removed), (2, 3))
+
+
+class RepositoryVersionAddContentTestCase(TestCase):
+
+    def setUp(self):
+        self.repository = Repository.objects.create(name='foo')
+        self.contents = [Content.objects.create() for i in range(5)]
+        self.base = RepositoryVersion.objects.create(repository=self.repository, number=1)
+        self.base.add_content(Content.objects.filter(pk__in=[c.pk for c in self.contents[:2]]))
+        self.version = RepositoryVersion.objects.create(repository=self.repository, number=2)
+
+    def assertAdded(self):
+        memberships = RepositoryContent.objects.filter(version_added=self.version)
+        self.assertEqual(
+            sorted(memberships.values_list('content', flat=True)),
+            sorted(c.pk for c in self.contents[2:])
+        )
+        for membership in memberships:
+            self.assertIsInstance(membership.pk, uuid.UUID)
+            self.assertEqual(membership.number_added, 2)
+            self.assertEqual(membership.repository, self.repository)
+            self.assertIsNotNone(membership._created)
+        self.assertEqual(self.version.content.count(), 5)
+
+    def test_insert(self):
+        """The content not in the version is added with a single statement."""
+        with self.assertNumQueries(1):
+            self.version.add_content(Content.objects.all())
+        self.assertAdded()
+
+    def test_nothing(self):
+        """Adding an empty list of content does nothing."""
+        self.version.add_content(Content.objects.filter(pk__in=[]))
+        self.assertEqual(self.version.content.count(), 2)
+
+    @patch.object(RepositoryVersion, 'UUID_SQL', {})
+    @patch.object(RepositoryVersion, 'CONTENT_BATCH_SIZE', 2)
+    def test_batches(self):
+        """The content is added in batches on the databases without an insert from a select."""
+        self.version.add_content(Content.objects.all())
+        self.assertAdded()
+
+
+class RepositoryVersionCreateTestCase(TestCase):
+
+    def setUp(self):
+        job = Mock(id=Task.objects.create().pk)
+        patcher = patch('pulpcore.app.models.task.get_current_job', return_value=job)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.repository = Repository.objects.create(name='foo')
+        self.contents = [Content.objects.create() for i in range(6)]
+        self.base = self.version(self.repository, self.pks(0, 1, 2, 3))
+        self.latest = self.version(self.repository, self.pks(2, 3, 4, 5), self.pks(0, 1))
+
+    def pks(self, *indexes):
+        return [self.contents[i].pk for i in indexes]
+
+    def version(self, repository, added, removed=()):
+        with RepositoryVersion.create(repository) as version:
+            version.remove_content(Content.objects.filter(pk__in=removed))
+            version.add_content(Content.objects.filter(pk__in=added))
+        return version
+
+    def content(self, version):
+        return set(version.content.values_list('pk', flat=True))
+
+    def test_base_version(self):
+        """The content of a new version is the content of its base version."""
+        with RepositoryVersion.create(self.repository, base_version=self.base) as version:
+            pass
+        self.assertEqual(self.content(version), set(self.pks(0, 1, 2, 3)))
+        self.assertEqual(set(version.added().values_list('pk', flat=True)), set(self.pks(0, 1)))
+        self.assertEqual(set(version.removed().values_list('pk', flat=True)), set(self.pks(4, 5)))
+        self.assertEqual(self.content(self.latest), set(self.pks(2, 3, 4, 5)))
+
+    def test_other_repository(self):
+        """The base version can be of another repository."""
+        other = Repository.objects.create(name='bar')
+        base = self.version(other, self.pks(1, 3, 5))
+        with RepositoryVersion.create(self.repository, base_version=base) as version:
+            pass
+        self.assertEqual(self.content(version), set(self.pks(1, 3, 5)))
+        self.assertEqual(self.content(self.latest), set(self.pks(2, 3, 4, 5)))
+
+    @patch.object(RepositoryVersion, 'UUID_SQL', {})
+    @patch.object(RepositoryVersion, 'CONTENT_BATCH_SIZE', 1)
+    def test_batches(self):
+        """The differences are applied in batches without an insert from a select."""
+        with RepositoryVersion.create(self.repository, base_version=self.base) as version:
+            pass
+        self.assertEqual(self.content(version), set(self.pks(0, 1, 2, 3)))
+
+
+class RepositoryVersionComputeCountsTestCase(TestCase):
+
+    def setUp(self):
+        self.repository = Repository.objects.create(name='foo')
+        self.contents = Content.objects.bulk_create(
+            [Content(_type='core.a') for i in range(3)] +
+            [Content(_type='core.b') for i in range(2)]
+        )
+        self.number = 0
+
+    def pks(self, indexes):
+        return [self.contents[i].pk for i in indexes]
+
+    def version(self, added=(), removed=()):
+        self.number += 1
+        version = RepositoryVersion.objects.create(repository=self.repository, number=self.number)
+        version.remove_content(Content.objects.filter(pk__in=self.pks(removed)))
+        version.add_content(Content.objects.filter(pk__in=self.pks(added)))
+        version.complete = True
+        version.save()
+        return version
+
+    def counts(self, version):
+        return sorted(version.counts.values_list('count_type', 'content_type', 'count'))
+
+    def test_incremental(self):
+        """The content present is counted from the previous version and the changes."""
+        self.version(added=(0, 1, 3)).compute_counts()
+        version = self.version(added=(2, 4), removed=(0, 3))
+        with patch.object(RepositoryVersion, 'content', None):
+            version.compute_counts()
+            version.compute_counts()
+        self.assertEqual(self.counts(version), [
+            ('A', 'core.a', 1), ('A', 'core.b', 1),
+            ('P', 'core.a', 2), ('P', 'core.b', 1),
+            ('R', 'core.a', 1), ('R', 'core.b', 1),
+        ])
+
+    def test_previous_without_counts(self):
+        """The content present is counted from the content when the previous has no counts."""
+        self.version(added=(0, 3))
+        version = self.version(removed=(3,))
+        version.compute_counts()
+        self.assertEqual(self.counts(version), [('P', 'core.a', 1), ('R', 'core.b', 1)])
+
+    def test_emptied(self):
+        """The content present is counted from an empty previous version."""
+        self.version(added=(0,)).compute_counts()
+        self.version(removed=(0,)).compute_counts()
+        version = self.version(added=(1,))
+        with patch.object(RepositoryVersion, 'content', None):
+            version.compute_counts()
+        self.assertEqual(self.counts(version), [('A', 'core.a', 1), ('P', 'core.a', 1)])
+
+
+class RepositoryVersionDeleteRangeTestCase(TestCase):
+
+    # The content added and removed by each version, by index
+    CHANGES = [
+        ((0, 1, 2, 3), ()),
+        ((4,), (0, 1)),
+        ((0, 5), (3, 4)),
+        ((6,), (0,)),
+        ((0, 1), (6,)),
+        ((7,), (0,)),
+    ]
+
+    def setUp(self):
+        self.repository = Repository.objects.create(name='foo')
+        self.contents = [Content.objects.create() for i in range(8)]
+        self.versions = []
+        for number, (added, removed) in enumerate(self.CHANGES, 1):
+            version = RepositoryVersion.objects.create(repository=self.repository, number=number)
+            version.remove_content(Content.objects.filter(pk__in=self.pks(*removed)))
+            version.add_content(Content.objects.filter(pk__in=self.pks(*added)))
+            version.complete = True
+            version.save()
+            version.compute_counts()
+            self.versions.append(version)
+        self.repository.last_version = len(self.CHANGES)
+        self.repository.save()
+        self.expected = [self.content(version) for version in self.versions]
+
+    def pks(self, *indexes):
+        return [self.contents[i].pk for i in indexes]
+
+    def content(self, version):
+        return set(version.content.values_list('pk', flat=True))
+
+    def numbers(self):
+        return list(self.repository.versions.order_by('number').values_list('number', flat=True))
+
+    def test_squash(self):
+        """The content of the versions left is the same."""
+        deleted = RepositoryVersion.delete_range(self.repository, 2, 4)
+        self.assertEqual(deleted, [2, 3, 4])
+        self.assertEqual(self.numbers(), [1, 5, 6])
+        for i in (0, 4, 5):
+            self.assertEqual(self.content(self.versions[i]), self.expected[i])
+        added = set(self.versions[4].added().values_list('pk', flat=True))
+        removed = set(self.versions[4].removed().values_list('pk', flat=True))
+        self.assertEqual(added, set(self.pks(5)))
+        self.assertEqual(removed, set(self.pks(3)))
+        self.assertEqual(
+            sorted(self.versions[4].counts.values_list('count_type', 'count')),
+            [('A', 1), ('P', 4), ('R', 1)]
+        )
+        for membership in RepositoryContent.objects.all():
+            self.assertEqual(membership.number_added, membership.version_added.number)
+            if membership.version_removed:
+                self.assertEqual(membership.number_removed, membership.version_removed.number)
+
+    def test_squash_readded(self):
+        """Content removed and added back keeps its relationship, whatever the batch size."""
+        with patch.object(RepositoryVersion, 'CONTENT_BATCH_SIZE', 1):
+            RepositoryVersion.delete_range(self.repository, 2, 4)
+        self.assertEqual(self.numbers(), [1, 5, 6])
+        for i in (0, 4, 5):
+            self.assertEqual(self.content(self.versions[i]), self.expected[i])
+        for i, numbers in ((0, (1, 6)), (1, (1, None))):
+            relations = RepositoryContent.objects.filter(content=self.contents[i])
+            self.assertEqual(list(relations.values_list('number_added', 'number_removed')),
+                             [numbers])
+        for membership in RepositoryContent.objects.all():
+            self.assertEqual(membership.number_added, membership.version_added.number)
+            if membership.version_removed:
+                self.assertEqual(membership.number_removed, membership.version_removed.number)
+
+    def test_latest(self):
+        """The changes of the latest versions are reverted."""
+        RepositoryVersion.delete_range(self.repository, 5, 10)
+        self.assertEqual(self.numbers(), [1, 2, 3, 4])
+        self.assertEqual(self.content(self.versions[3]), self.expected[3])
+        self.assertFalse(RepositoryContent.objects.filter(number_removed__gt=4).exists())
+
+    def test_incomplete(self):
+        """Ranges with incomplete versions before the next complete one are refused."""
+        self.versions[2].complete = False
+        self.versions[2].save()
+        with self.assertRaises(ValueError):
+            RepositoryVersion.delete_range(self.repository, 2, 4)
+        with self.assertRaises(ValueError):
+            RepositoryVersion.delete_range(self.repository, 1, 2)
+        RepositoryVersion.delete_range(self.repository, 4, 4)
+        self.assertEqual(self.numbers(), [1, 2, 3, 5, 6])
+
+    def test_latest_incomplete(self):
+        """The latest versions are not reverted while a newer version is being created."""
+        version = RepositoryVersion.objects.create(repository=self.repository, number=7)
+        version.add_content(Content.objects.filter(pk__in=self.pks(3)))
+        with self.assertRaises(ValueError):
+            RepositoryVersion.delete_range(self.repository, 6, 10)
+        self.assertEqual(self.numbers(), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_nothing(self):
+        """Nothing is deleted without versions in the range."""
+        self.assertEqual(RepositoryVersion.delete_range(self.repository, 7, 10), [])
+        self.assertEqual(self.numbers(), [1, 2, 3, 4, 5, 6])
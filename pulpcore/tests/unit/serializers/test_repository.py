@@ -4,7 +4,11 @@ import mock
 from rest_framework import serializers
 
 from pulpcore.app.models import BaseDistribution
-from pulpcore.app.serializers import BaseDistributionSerializer, PublicationSerializer
+from pulpcore.app.serializers import (
+    BaseDistributionSerializer,
+    PublicationSerializer,
+    RepositoryVersionDeleteRangeSerializer,
+)
 
 
 class TestPublicationSerializer(TestCase):
@@ -107,3 +111,14 @@ class TestDistributionPath(TestCase):
         serializer = BaseDistributionSerializer(data=data)
         self.assertFalse(serializer.is_valid())
         self.assertDictEqual(overlap_errors, serializer.errors)
+
+
+class TestRepositoryVersionDeleteRangeSerializer(TestCase):
+
+    def test_validate(self):
+        serializer = RepositoryVersionDeleteRangeSerializer(data={'first': 2, 'last': 4})
+        self.assertTrue(serializer.is_valid())
+
+    def test_validate_first_after_last(self):
+        serializer = RepositoryVersionDeleteRangeSerializer(data={'first': 4, 'last': 2})
+        self.assertFalse(serializer.is_valid())
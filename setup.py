@@ -35,7 +35,8 @@ setup(
     install_requires=requirements,
     extras_require={
         'postgres': ['psycopg2-binary'],
-        'mysql': ['mysqlclient']
+        'mysql': ['mysqlclient'],
+        'brotli': ['brotli']
     },
     include_package_data=True,
     classifiers=(